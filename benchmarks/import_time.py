@@ -0,0 +1,78 @@
+"""
+Import time of the package and its widget-free modules, each measured in a fresh
+interpreter. Fails (exit code 1) if a widget-free module imports ipywidgets or
+IPython, or if an import exceeds its time budget.
+
+Usage:
+    python benchmarks/import_time.py [--repeat 5] [--output results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from statistics import median
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# (statement, must stay widget-free, time budget in ms)
+IMPORTS = [
+    ('import ipyformkit', True, 50),
+    ('import ipyformkit.spec', True, 50),
+    ('import ipyformkit.rules', True, 50),
+    ('import ipyformkit.state', True, 50),
+    ('from ipyformkit import RuleSet', True, 50),
+    ('from ipyformkit import Form', False, None),
+]
+
+PROBE = """
+import sys
+from time import perf_counter
+start = perf_counter()
+{statement}
+duration = perf_counter() - start
+print(duration, 'ipywidgets' in sys.modules or 'IPython' in sys.modules)
+"""
+
+
+#=====================================================================
+def measure(statement, repeat):
+    """
+    :return: (median import time in ms, whether ipywidgets or IPython were imported)
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC, os.environ.get('PYTHONPATH', '')]))
+    durations = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(statement=statement)],
+                             env=env, capture_output=True, text=True, check=True).stdout.split()
+        durations.append(float(out[0]) * 1000)
+    return median(durations), out[1] == 'True'
+
+#=====================================================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per import. Default is 5.')
+    parser.add_argument('--output', help='Write the results as JSON to this file instead of stdout.')
+    args = parser.parse_args()
+
+    results = []
+    failed = False
+    for statement, widget_free, budget in IMPORTS:
+        ms, widgets_imported = measure(statement, args.repeat)
+        ok = not (widget_free and widgets_imported) and (budget is None or ms <= budget)
+        failed |= not ok
+        print(f"{statement:<36} {ms:>8.1f} ms {'ipywidgets' if widgets_imported else '':>10} "
+              f"{'' if ok else 'FAILED'}", file=sys.stderr)
+        results.append({'statement': statement, 'median_ms': ms, 'widgets_imported': widgets_imported,
+                        'budget_ms': budget, 'ok': ok})
+
+    output = json.dumps({'python': sys.version.split()[0], 'results': results}, indent=1)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+Headless benchmarks of form construction and interaction.
+
+Widgets are created without a frontend (ipywidgets falls back to a dummy comm),
+durations are measured with perf_counter and comm messages are counted at
+Widget._send, i.e. what would be sent to the browser.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--quick] [--filter NAME] [--output results.json]
+    python benchmarks/run_benchmarks.py --compare old.json new.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from statistics import median
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import ipywidgets as widgets
+import ipyformkit as ifk
+from ipyformkit.core import dict_to_form
+from ipyformkit.custom_widgets import FileAutocomplete
+from ipyformkit.filesearch import DirectoryCache, PathIndex
+from ipyformkit.profiling import Profiler
+
+BENCHMARKS = []
+
+
+#=====================================================================
+def benchmark(*params, quick=None):
+    """
+    Register a benchmark function, called once per parameter. The function
+    returns a callable that runs the measured operation once.
+    :param params: The parameters of the full run.
+    :param quick: The parameters of a --quick run. Default is params.
+    """
+    def decorator(func):
+        BENCHMARKS.append((func, params, params if quick is None else quick))
+        return func
+    return decorator
+
+#=====================================================================
+def run(func, param, repeat):
+    """
+    Set up a benchmark and run its operation repeat times.
+    :return: A dictionary with the timings in milliseconds and the comm messages per run.
+    """
+    operation = func(param)
+    profiler = Profiler(max_samples=repeat)
+    for _ in range(repeat):
+        with profiler.event('run'):
+            operation()
+    timings = list(profiler.timings['run'].samples)
+    messages = list(profiler.messages['run'].samples)
+    return {
+        'name': func.__name__,
+        'param': param,
+        'repeat': repeat,
+        'median_ms': median(timings) * 1000,
+        'min_ms': min(timings) * 1000,
+        'max_ms': max(timings) * 1000,
+        'messages': median(messages),
+    }
+
+#=====================================================================
+def synthetic_form(n_fields):
+    """
+    A form dictionary with n_fields fields of all basic types, with tuple rows
+    and a nested sub-form every 20 fields, and conditions that depend on a switch.
+    :return: (input_dict, disable, check)
+    """
+    input_dict = {'switch': True}
+    disable, check = {}, {}
+    i = 0
+    while i < n_fields:
+        if i % 20 == 10:
+            input_dict[f'section {i}'] = {f'nested {i + j}': float(j) + 0.5 for j in range(5)}
+            i += 5
+        elif i % 20 == 15:
+            input_dict[(f'left {i}', f'right {i}')] = (i, f'text {i}')
+            i += 2
+        else:
+            kind = i % 4
+            key = f'field {i}'
+            input_dict[key] = (f'text {i}', i, ('a', 'b', 'c'), False)[kind]
+            if kind == 0:
+                disable[key] = lambda d: d['switch']
+            elif kind == 1:
+                check[key] = lambda d, key=key: d[key] >= 0
+            i += 1
+    return input_dict, disable, check
+
+#=====================================================================
+def make_files(n_files, per_folder=None):
+    """
+    Create a temporary directory with n_files files.
+    :param per_folder: If given, the files are split into sub folders of this size.
+    :return: The path of the directory.
+    """
+    root = tempfile.mkdtemp(prefix='ifk-bench-')
+    for i in range(n_files):
+        folder = root
+        if per_folder:
+            folder = os.path.join(root, f'folder_{i // per_folder:03d}')
+            if i % per_folder == 0:
+                os.mkdir(folder)
+        open(os.path.join(folder, f'file_{i:06d}.txt'), 'w').close()
+    TEMP_DIRS.append(root)
+    return root
+
+TEMP_DIRS = []
+
+#=====================================================================
+def changed_values(form):
+    """
+    :return: A different valid value for every field of form.
+    """
+    values = {}
+    for key, value in form.get_values().items():
+        if isinstance(value, bool):
+            values[key] = not value
+        elif isinstance(value, (int, float)):
+            values[key] = value + 1
+        elif isinstance(value, str) and key in form.widgets_dict and isinstance(form.widgets_dict[key].wid, widgets.Dropdown):
+            values[key] = 'b' if value != 'b' else 'c'
+        else:
+            values[key] = value + 'x'
+    return values
+
+#=====================================================================
+@benchmark(10, 100, 1000, quick=(10, 100))
+def dict_to_form_build(n_fields):
+    input_dict, disable, check = synthetic_form(n_fields)
+    return lambda: dict_to_form(input_dict)
+
+#=====================================================================
+@benchmark(10, 100, 1000, quick=(10, 100))
+def form_init(n_fields):
+    input_dict, disable, check = synthetic_form(n_fields)
+    return lambda: ifk.Form(input_dict, disable=disable, check=check)
+
+#=====================================================================
+@benchmark(10, 100, 200, 1000, quick=(10, 200))
+def form_init_set_values(n_fields):
+    """ Create a form and set a value for every field, the baseline of template_instantiate. """
+    input_dict, disable, check = synthetic_form(n_fields)
+    values = changed_values(ifk.Form(input_dict))
+    def operation():
+        ifk.Form(input_dict, disable=disable, check=check).set_values(values)
+    return operation
+
+#=====================================================================
+@benchmark(10, 100, 200, 1000, quick=(10, 200))
+def template_instantiate(n_fields):
+    """ Create a form with a value for every field from a FormTemplate. """
+    input_dict, disable, check = synthetic_form(n_fields)
+    values = changed_values(ifk.Form(input_dict))
+    template = ifk.FormTemplate(input_dict, disable=disable, check=check)
+    return lambda: template.instantiate(values=values)
+
+#=====================================================================
+@benchmark(10, 100, 1000, quick=(10, 100))
+def keystroke_storm(n_fields):
+    """ 100 keystrokes into a text field, through the observer path. """
+    input_dict, disable, check = synthetic_form(n_fields)
+    form = ifk.Form(input_dict, disable=disable, check=check)
+    wid = form.widgets_dict['field 0'].wid
+    def operation():
+        wid.value = ''
+        for i in range(100):
+            wid.value += 'x'
+    return operation
+
+#=====================================================================
+@benchmark(10, 100, 1000, quick=(10, 100))
+def toggle_switch(n_fields):
+    """ Toggle the checkbox all disable conditions depend on. """
+    input_dict, disable, check = synthetic_form(n_fields)
+    form = ifk.Form(input_dict, disable=disable, check=check)
+    wid = form.widgets_dict['switch'].wid
+    def operation():
+        wid.value = not wid.value
+    return operation
+
+#=====================================================================
+@benchmark(10, 100, 1000, quick=(10, 100))
+def set_values_bulk(n_fields):
+    """ Set every field with a single set_values call. """
+    input_dict, disable, check = synthetic_form(n_fields)
+    form = ifk.Form(input_dict, disable=disable, check=check)
+    values = [form.get_values(), changed_values(form)]
+    state = [0]
+    def operation():
+        state[0] = 1 - state[0]
+        form.set_values(values[state[0]], verbose=False)
+    return operation
+
+#=====================================================================
+@benchmark(100, 1000, quick=(100,))
+def check_and_return_values(n_fields):
+    input_dict, disable, check = synthetic_form(n_fields)
+    form = ifk.Form(input_dict, disable=disable, check=check)
+    return form.check_and_return_values
+
+#=====================================================================
+@benchmark(10, 50, 200, quick=(10,))
+def masonry(n_forms):
+    """ n_forms forms of 20 fields each in one Masonry. """
+    input_dict, disable, check = synthetic_form(20)
+    return lambda: ifk.Masonry([ifk.Form(input_dict, disable=disable, check=check) for _ in range(n_forms)])
+
+#=====================================================================
+@benchmark(1000, 10000, 100000, quick=(1000,))
+def file_autocomplete_typing(n_files):
+    """ Type a file name into a FileAutocomplete over one flat folder (synchronous search, cold directory cache). """
+    root = make_files(n_files)
+    wid = FileAutocomplete(root_path=root, asynchronous=False, cache=DirectoryCache())
+    typed = 'file_0005'
+    def operation():
+        wid.cache.invalidate()
+        wid.text.value = ''
+        for i in range(1, len(typed) + 1):
+            wid.text.value = typed[:i]
+    return operation
+
+#=====================================================================
+@benchmark(1000, 10000, 100000, quick=(1000,))
+def file_index_search(n_files):
+    """ Fuzzy search in a recursive index, keystroke by keystroke. """
+    root = make_files(n_files, per_folder=1000)
+    index = PathIndex(root, time_budget=None)
+    index.start()
+    index._thread.join()
+    typed = 'fld1file5'
+    def operation():
+        index._last_search = None
+        for i in range(1, len(typed) + 1):
+            index.search(typed[:i], 10)
+    return operation
+
+#=====================================================================
+def environment():
+    return {
+        'ipyformkit': ifk.__version__,
+        'ipywidgets': widgets.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+#=====================================================================
+def compare(old_path, new_path):
+    """
+    Print the ratio of median times and messages of two result files.
+    """
+    with open(old_path) as f:
+        old = {(r['name'], r['param']): r for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = json.load(f)['results']
+    print(f"{'benchmark':<32} {'param':>7} {'old ms':>10} {'new ms':>10} {'ratio':>7} {'msgs':>15}")
+    for r in new:
+        o = old.get((r['name'], r['param']))
+        if o is None:
+            continue
+        ratio = r['median_ms'] / o['median_ms'] if o['median_ms'] else float('nan')
+        msgs = f"{o['messages']:g} -> {r['messages']:g}"
+        print(f"{r['name']:<32} {r['param']:>7} {o['median_ms']:>10.3f} {r['median_ms']:>10.3f} {ratio:>7.2f} {msgs:>15}")
+
+#=====================================================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='Only run the small sizes.')
+    parser.add_argument('--filter', default='', help='Only run benchmarks whose name contains this text.')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per benchmark. Default is 5.')
+    parser.add_argument('--output', help='Write the results as JSON to this file instead of stdout.')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two result files.')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = []
+    try:
+        for func, params, quick in BENCHMARKS:
+            if args.filter not in func.__name__:
+                continue
+            for param in quick if args.quick else params:
+                result = run(func, param, args.repeat)
+                print(f"{result['name']:<32} {param:>7} {result['median_ms']:>10.3f} ms "
+                      f"{result['messages']:>8g} msgs", file=sys.stderr)
+                results.append(result)
+    finally:
+        for root in TEMP_DIRS:
+            shutil.rmtree(root, ignore_errors=True)
+
+    output = json.dumps({'environment': environment(), 'results': results}, indent=1)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
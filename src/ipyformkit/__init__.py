@@ -4,5 +4,49 @@ IpyFormKit: Easy form creation with ipywidgets in Jupyter.
 
 __version__ = "0.1.0"
 
-from .custom_widgets import *
-from .core import Form, Masonry
\ No newline at end of file
+import importlib
+
+# Public names and their modules, imported on first access (PEP 562), so that
+# e.g. batch workers that only use RuleSet never import ipywidgets or IPython.
+# The spec, rules and state modules are widget-free.
+_LAZY_ATTRIBUTES = {
+    'Form': 'core',
+    'FormTemplate': 'core',
+    'Masonry': 'core',
+    'register_field_kind': 'core',
+    'widget_counts': 'core',
+    'FileAutocomplete': 'custom_widgets',
+    'SearchableDropdown': 'custom_widgets',
+    'CollapsibleVBox': 'custom_widgets',
+    'close_widgets': 'custom_widgets',
+    'RuleSet': 'rules',
+    'ValidationResult': 'rules',
+    'compile_spec': 'spec',
+    'register_field_type': 'spec',
+    'Profiler': 'profiling',
+    'EventRecorder': 'replay',
+    'replay_events': 'replay',
+    'RecordEditor': 'records',
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        # Submodules, e.g. ipyformkit.core, as before the import was lazy
+        try:
+            return importlib.import_module(f'.{name}', __name__)
+        except ModuleNotFoundError as e:
+            if e.name != f'{__name__}.{name}':
+                raise
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    # Cache, later accesses do not call __getattr__ anymore
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_LAZY_ATTRIBUTES})
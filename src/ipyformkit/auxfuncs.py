@@ -1,34 +1,273 @@
+import weakref
+from types import MethodType
 from decimal import Decimal
-from time import time
-from threading import Timer
+from time import monotonic
+from functools import wraps
 
+
+#=====================================================================
+def _kernel_loop():
+    """ Return the asyncio loop the kernel runs on (the one of the tornado IOLoop,
+        or the running asyncio loop), or None if no loop is running. """
+    try:
+        from tornado.ioloop import IOLoop
+        loop = IOLoop.current(instance=False)
+    except ImportError:
+        loop = None
+    # A loop that was stopped (e.g. after run_sync in a script) would never run a callback
+    if loop is not None and loop.asyncio_loop.is_running():
+        return loop.asyncio_loop
+
+    # Imported here, asyncio is slow to import and not needed by the widget-free modules
+    import asyncio
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+#=====================================================================
+def call_later(delay, callback):
+    """ Schedule callback on the running event loop of the kernel.
+        :return: A function cancelling the call, or None if no loop is running. """
+    loop = _kernel_loop()
+    if loop is None:
+        return None
+    return loop.call_later(delay, callback).cancel
+
+#=====================================================================
+def threadsafe_scheduler():
+    """ Return a thread-safe function that schedules a callback on the running
+        event loop of the kernel, or None if no loop is running. Must be called
+        from the kernel's main thread, the returned function can be called from any thread. """
+    loop = _kernel_loop()
+    if loop is None:
+        return None
+    return loop.call_soon_threadsafe
+
+#=====================================================================
+class Debouncer(object):
+    """ Delays calls to fn on the event loop of the kernel, so widget state is
+        only ever touched from the kernel's main thread.
+
+        mode='debounce' runs fn once wait seconds after the last call.
+        mode='throttle' runs fn at most once every wait seconds, the last
+        call of a burst is always executed.
+
+        Only the most recent arguments are used. The result or exception of
+        the last executed call is stored in .result and .exception. Without a
+        running event loop calls are executed immediately. """
+    def __init__(self, fn, wait, mode='debounce'):
+        if mode not in ('debounce', 'throttle'):
+            raise ValueError(f"mode must be 'debounce' or 'throttle', got {mode!r}")
+        self.fn = fn
+        self.wait = wait
+        self.mode = mode
+        self.result = None
+        self.exception = None
+        self._args = None
+        self._cancel = None
+        self._time_of_last_call = None
+
+    @property
+    def pending(self):
+        return self._args is not None
+
+    def __call__(self, *args, **kwargs):
+        self._args = (args, kwargs)
+        if self.mode == 'debounce':
+            self.cancel_timer()
+            delay = self.wait
+        elif self._cancel is not None:
+            return
+        else:
+            since = monotonic() - self._time_of_last_call if self._time_of_last_call is not None else self.wait
+            delay = max(0, self.wait - since)
+
+        self._cancel = call_later(delay, self._run)
+        if self._cancel is None:
+            return self.flush()
+
+    def _run(self):
+        self._cancel = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error in delayed call of {getattr(self.fn, '__name__', self.fn)}\n{type(e).__name__}:{e}")
+
+    def cancel_timer(self):
+        """ Cancel the scheduled call, pending arguments are kept. """
+        if self._cancel is not None:
+            self._cancel()
+            self._cancel = None
+
+    def flush(self):
+        """ Run the pending call immediately.
+            :return: The result of the call, errors are raised. """
+        self.cancel_timer()
+        if self._args is None:
+            return self.result
+        args, kwargs = self._args
+        self._args = None
+        self._time_of_last_call = monotonic()
+        try:
+            self.result = self.fn(*args, **kwargs)
+            self.exception = None
+        except Exception as e:
+            self.exception = e
+            raise
+        return self.result
+
+#=====================================================================
 def throttle(wait):
     """ Decorator that prevents a function from being called
         more than once every wait period. """
     def decorator(fn):
-        time_of_last_call = 0
-        scheduled, timer = False, None
-        new_args, new_kwargs = None, None
+        debouncer = Debouncer(fn, wait, mode='throttle')
+        @wraps(fn)
         def throttled(*args, **kwargs):
-            nonlocal new_args, new_kwargs, time_of_last_call, scheduled, timer
-            def call_it():
-                nonlocal new_args, new_kwargs, time_of_last_call, scheduled, timer
-                time_of_last_call = time()
-                fn(*new_args, **new_kwargs)
-                scheduled = False
-            time_since_last_call = time() - time_of_last_call
-            new_args, new_kwargs = args, kwargs
-            if not scheduled:
-                scheduled = True
-                new_wait = max(0, wait - time_since_last_call)
-                timer = Timer(new_wait, call_it)
-                timer.start()
+            return debouncer(*args, **kwargs)
+        throttled.flush = debouncer.flush
         return throttled
     return decorator
 
+#=====================================================================
+def debounce(wait):
+    """ Decorator that delays a function call until wait seconds
+        have passed without another call. """
+    def decorator(fn):
+        debouncer = Debouncer(fn, wait, mode='debounce')
+        @wraps(fn)
+        def debounced(*args, **kwargs):
+            return debouncer(*args, **kwargs)
+        debounced.flush = debouncer.flush
+        return debounced
+    return decorator
+
+#=====================================================================
+class WeakCallback(object):
+    """ Callable for observers: bound methods are held by a weak reference, so the
+        observer does not keep its owner alive, plain functions by a strong one.
+        Once the owner was garbage-collected, calls do nothing.
+        args are passed before the call arguments, like functools.partial. """
+    def __init__(self, func, *args):
+        if isinstance(func, MethodType):
+            self._ref = weakref.WeakMethod(func)
+            self._func = None
+        else:
+            self._ref = None
+            self._func = func
+        self.args = args
+
+    @property
+    def alive(self):
+        return self._ref is None or self._ref() is not None
+
+    def __call__(self, *args, **kwargs):
+        func = self._func if self._ref is None else self._ref()
+        if func is None:
+            return None
+        return func(*self.args, *args, **kwargs)
+
 #=====================================================================
 def count_decimal_places(value: float) -> int:
     # Convert via string to preserve user input formatting
     d = Decimal(str(value)).normalize()
     # Negative exponent means decimal places
-    return abs(d.as_tuple().exponent)
\ No newline at end of file
+    return abs(d.as_tuple().exponent)
+
+#=====================================================================
+def toggle_class(classes, name, active):
+    """ Add or remove a CSS class name in a list of classes in place. """
+    if active and name not in classes:
+        classes.append(name)
+    elif not active and name in classes:
+        classes.remove(name)
+
+#=====================================================================
+class TrackingDict(object):
+    """ Read-only view on a value dictionary that records which keys
+        are accessed. Iterating over the view marks all keys as read. """
+    def __init__(self, data):
+        self._data = data
+        self.accessed = set()
+        self.accessed_all = False
+
+    def __getitem__(self, key):
+        self.accessed.add(key)
+        return self._data[key]
+
+    def get(self, key, default=None):
+        self.accessed.add(key)
+        return self._data.get(key, default)
+
+    def __contains__(self, key):
+        self.accessed.add(key)
+        return key in self._data
+
+    def __iter__(self):
+        self.accessed_all = True
+        return iter(self._data)
+
+    def __len__(self):
+        self.accessed_all = True
+        return len(self._data)
+
+    def keys(self):
+        self.accessed_all = True
+        return self._data.keys()
+
+    def values(self):
+        self.accessed_all = True
+        return self._data.values()
+
+    def items(self):
+        self.accessed_all = True
+        return self._data.items()
+
+    def copy(self):
+        self.accessed_all = True
+        return dict(self._data)
+
+    def __repr__(self):
+        return repr(self._data)
+
+#=====================================================================
+class DependencyGraph(object):
+    """ Maps nodes (e.g. conditions) to the value keys they read and
+        answers which nodes are affected by a change of a given key.
+        Nodes with unknown dependencies are affected by every change. """
+    def __init__(self):
+        self._dependencies = {}
+        self._dependents = {}
+        self._wildcard = set()
+
+    def set(self, node, keys):
+        """ Set the dependencies of node. None means 'depends on everything'. """
+        self.discard(node)
+        if keys is None:
+            self._wildcard.add(node)
+        else:
+            keys = frozenset(keys)
+            for key in keys:
+                self._dependents.setdefault(key, set()).add(node)
+        self._dependencies[node] = keys
+
+    def discard(self, node):
+        keys = self._dependencies.pop(node, None)
+        self._wildcard.discard(node)
+        for key in keys or ():
+            dependents = self._dependents.get(key)
+            if dependents is not None:
+                dependents.discard(node)
+                if not dependents:
+                    del self._dependents[key]
+
+    def get(self, node):
+        return self._dependencies.get(node)
+
+    def affected(self, key, wildcard=True):
+        """ Return the set of nodes that have to be re-evaluated if key changed.
+            With wildcard=False, nodes with unknown dependencies are left out. """
+        if not wildcard:
+            return set(self._dependents.get(key, ()))
+        return self._dependents.get(key, set()) | self._wildcard
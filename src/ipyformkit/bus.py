@@ -0,0 +1,116 @@
+"""
+Widget-free shared value store of several forms, e.g. the forms of a Masonry.
+"""
+from .auxfuncs import WeakCallback
+
+
+#=====================================================================
+class BusView(object):
+    """ Read-only view for the conditions of one form: its own values by key,
+        the values of the other forms on the bus as 'namespace.key'. Iterating
+        only covers the own values. """
+    def __init__(self, bus, namespace):
+        self._bus = bus
+        self._namespace = namespace
+        self._own = bus.stores[namespace]
+
+    def __getitem__(self, key):
+        if key in self._own:
+            return self._own[key]
+        namespace, separator, sub_key = key.partition(self._bus.separator) if isinstance(key, str) else ('', '', '')
+        store = self._bus.stores.get(namespace) if separator else None
+        if store is None or sub_key not in store:
+            raise KeyError(key)
+        return store[sub_key]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self._own)
+
+    def __len__(self):
+        return len(self._own)
+
+    def keys(self):
+        return self._own.keys()
+
+    def values(self):
+        return self._own.values()
+
+    def items(self):
+        return self._own.items()
+
+    def __repr__(self):
+        return f"BusView({self._namespace!r}, {dict(self._own)!r})"
+
+#=====================================================================
+class ValueBus(object):
+    def __init__(self, separator='.'):
+        """
+        Shared, namespaced values of several forms and the dispatcher of their changes.
+
+        Parameters
+        ----------
+        separator : str, optional
+            Separates the namespace from the key, e.g. 'settings.units'. Default is '.'.
+
+        Attributes
+        ----------
+        stores : dict
+            {namespace: mapping} with the live values of each form.
+        """
+        self.separator = separator
+        self.stores = {}
+        self._listeners = {}
+
+    #=====================================================================
+    def join(self, namespace, values, listener):
+        """
+        Add the values of a form to the bus.
+        :param namespace: The unique name of the form, must not contain the separator.
+        :param values: The live values of the form (a mapping that stays up to date).
+        :param listener: Called with the set of qualified keys ('namespace.key') whenever
+            values of another form change. Bound methods are held by a weak reference.
+        :return: A BusView for the conditions of the form.
+        """
+        if namespace in self.stores:
+            raise ValueError(f"Namespace '{namespace}' is already used on the bus.")
+        if self.separator in namespace:
+            raise ValueError(f"Namespace '{namespace}' must not contain '{self.separator}'.")
+        self.stores[namespace] = values
+        self._listeners[namespace] = WeakCallback(listener)
+        return BusView(self, namespace)
+
+    #=====================================================================
+    def leave(self, namespace):
+        """
+        Remove a form from the bus.
+        :param namespace: The name of the form.
+        """
+        self.stores.pop(namespace, None)
+        self._listeners.pop(namespace, None)
+
+    #=====================================================================
+    def publish(self, namespace, keys):
+        """
+        Dispatch changed values of one form once to all other forms.
+        :param namespace: The name of the form whose values changed.
+        :param keys: The changed keys (without namespace).
+        """
+        if not keys:
+            return
+        qualified = {f"{namespace}{self.separator}{key}" for key in keys}
+        for other, listener in list(self._listeners.items()):
+            if other != namespace:
+                listener(qualified)
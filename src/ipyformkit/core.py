@@ -1,34 +1,119 @@
 import ipywidgets as widgets
-from IPython.display import display, HTML, Javascript
+from IPython.display import display, Javascript
 import os
+import weakref
+from pathlib import Path
+from functools import lru_cache, partial
+from types import MappingProxyType
+from contextlib import ExitStack, contextmanager, nullcontext
 from .custom_widgets import *
 from .auxfuncs import *
+from .rules import RuleSet
+from .bus import ValueBus
+from .submit import SubmitAction
+from .spec import *
+from .state import make_state, write_state, read_state, schema_hash, migrate_values, decode_values, register_value_codec
 
+try:
+    from importlib.resources import files
+except ImportError:
+    files = None
+
+
+# Live Form and Masonry objects, see widget_counts
+_live_forms = weakref.WeakSet()
+_live_masonries = weakref.WeakSet()
 
 #=====================================================================
-def load_stylesheets():
+@lru_cache(maxsize=None)
+def read_stylesheets():
     """
-    Load custom stylesheets for the widgets.
-    :return: A list of HTML elements containing the stylesheets.
+    Read the custom stylesheets from the package once per process.
+    :return: A tuple with the CSS of all stylesheets.
     """
-    # Get the directory of this file (core.py)
-    module_dir = os.path.dirname(os.path.abspath(__file__))
     stylesheets = [
-        'assets/custom_widgets.css',
-        'assets/ipyformkit.css'
+        'custom_widgets.css',
+        'ipyformkit.css'
     ]
 
     sheets = []
 
     for stylesheet in stylesheets:
-        stylesheet = module_dir + os.sep + stylesheet
-        if os.path.exists(stylesheet):
-            with open(stylesheet, 'r') as f:
-                css = f.read()
-                sheets.append(HTML(f'<style>{css}</style>'))
+        if files is not None:
+            resource = files(__package__).joinpath('assets').joinpath(stylesheet)
+        else:
+            # Python < 3.9: the directory of this file (core.py)
+            module_dir = os.path.dirname(os.path.abspath(__file__))
+            resource = Path(module_dir, 'assets', stylesheet)
+
+        if resource.is_file():
+            sheets.append(resource.read_text())
         else:
             print(f"Warning: {stylesheet} not found. Custom styles will not be applied.")
-    return sheets
+    return tuple(sheets)
+
+#=====================================================================
+_stylesheet_widgets = []
+
+def load_stylesheets():
+    """
+    Load custom stylesheets for the widgets.
+    The stylesheets are wrapped in one hidden HTML widget that is shared by all
+    forms, so the CSS is sent to the frontend only once and every further
+    display only adds a reference to the same widget model.
+    :return: A list of HTML widgets containing the stylesheets.
+    """
+    global _stylesheet_widgets
+    # Recreate the widget if it was closed, e.g. by widgets.Widget.close_all()
+    if not _stylesheet_widgets or _stylesheet_widgets[0].comm is None:
+        css = '\n'.join(read_stylesheets())
+        if not css:
+            return []
+        sheet = widgets.HTML(f'<style>{css}</style>', layout=widgets.Layout(display='none'))
+        sheet.add_class('ifk-stylesheet')
+        _stylesheet_widgets = [sheet]
+    return list(_stylesheet_widgets)
+
+#=====================================================================
+# Widget factories per field kind, each takes a Field and returns the input widget
+# with field.default as its initial value
+WIDGET_FACTORIES = {
+    'button': lambda field: widgets.Button(description=field.key),
+    'checkbox': lambda field: widgets.Checkbox(value=field.default, indent=False),
+    'int': lambda field: widgets.IntText(value=field.default),
+    'float': lambda field: widgets.FloatText(value=field.default, step=field.params['step']),
+    'file': lambda field: FileAutocomplete(placeholder=field.params['placeholder'], value=field.default),
+    'password': lambda field: widgets.Password(value=field.default, placeholder=field.params['placeholder']),
+    'textarea': lambda field: widgets.Textarea(value=field.default, placeholder=field.params['placeholder']),
+    'text': lambda field: widgets.Text(value=field.default, placeholder=field.params['placeholder']),
+    'searchable': lambda field: SearchableDropdown(options=field.value, value=field.default),
+    'dropdown': lambda field: widgets.Dropdown(options=field.value, value=field.default),
+    'label': lambda field: widgets.Label(value=field.default),
+}
+
+#=====================================================================
+def register_field_kind(value_type, kind, factory, default=None, encode=None, decode=None):
+    """
+    Add a custom field kind: values of value_type in a form dictionary are
+    shown with the widget created by factory.
+    :param value_type: The type (or tuple of types) of the values in the form dictionary.
+    :param kind: A name for the field kind.
+    :param factory: A function taking a Field and returning a widget with a value trait.
+    :param default: A function returning the initial widget value for a dictionary value.
+        Default is the dictionary value itself.
+    :param encode: A function converting a widget value to a value json can store, used by
+        save_state, e.g. datetime.date.isoformat. Default is None (stored as it is).
+    :param decode: The inverse of encode, used by load_state, e.g. datetime.date.fromisoformat.
+    """
+    def classify_value(key, value):
+        return Field(key, kind, value, value if default is None else default(value), {})
+
+    register_field_type(value_type, classify_value)
+    WIDGET_FACTORIES[kind] = factory
+    if encode is not None and decode is not None:
+        register_value_codec(kind, encode, decode)
+    elif encode is not None or decode is not None:
+        print(f"Warning: Field kind '{kind}' needs both encode and decode to be saved. Ignoring them.")
 
 #=====================================================================
 def create_widget(key, value):
@@ -38,39 +123,31 @@ def create_widget(key, value):
     :param value: The default value for the widget.
     :return: A widget object.
     """
-    label = widgets.Label(value=key)
+    return create_field_widget(classify(key, value))
+
+#=====================================================================
+def create_field_widget(field):
+    """
+    Create the widget of a compiled field, see spec.classify.
+    :param field: A Field.
+    :return: A widget object.
+    """
+    label = widgets.Label(value=field.key)
     
     box = widgets.Box([label])
     box.add_class('ifk-widget-box')
     box.add_class('widget-vbox')
     
-    if value is None:
-        wid = widgets.Button(description=key)
+    wid = WIDGET_FACTORIES[field.kind](field)
+    if field.default is not NO_VALUE and getattr(wid, 'value', field.default) != field.default:
+        # Custom factories that ignore field.default
+        wid.value = field.default
+    if field.kind == 'button':
         box.children = box.children[1:]
-    elif isinstance(value, bool):
-        wid = widgets.Checkbox(value=value, indent=False)
-    elif isinstance(value, int):
-        wid = widgets.IntText(value=value)
-    elif isinstance(value, float):
-        step = 10**(-count_decimal_places(value))
-        wid = widgets.FloatText(value=value, step=step)
-    elif isinstance(value, str):
-        if os.sep in value:
-            wid = FileAutocomplete(placeholder=value)
-            box.add_class('ifk-widget-FileAutocomplete')
-        elif 'password' in key.lower():
-            wid = widgets.Password(placeholder=value)
-        elif value.endswith('...'):
-            wid = widgets.Textarea(placeholder=value[:-3])
-        else:
-            wid = widgets.Text(placeholder=value)
-    elif isinstance(value, tuple):
-        if value:
-            wid = widgets.Dropdown(options=value, value=value[0])
-        else:
-            wid = widgets.Label(value="(Empty list - no options)")
-    else:
-        wid = widgets.Label(value=f"Unsupported type: {type(value).__name__}")
+    elif field.kind == 'file':
+        box.add_class('ifk-widget-FileAutocomplete')
+    elif field.kind == 'searchable':
+        box.add_class('ifk-widget-SearchableDropdown')
     
     box.children = list(box.children) + [wid,]
     
@@ -84,7 +161,7 @@ def create_widget(key, value):
     return box
 
 #=====================================================================
-def dict_to_form(input_dict, title=None, collapsed=None, nested=False):
+def dict_to_form(input_dict, title=None, collapsed=None, nested=False, lazy_sections=None):
     """
     Convert a dictionary to a form with widgets.
 
@@ -93,6 +170,7 @@ def dict_to_form(input_dict, title=None, collapsed=None, nested=False):
     input_dict : dict
         A dictionary containing the input fields and their default values.
         Keys represent field names, and values represent default values or options.
+        Rows compiled with spec.compile_spec are accepted as well.
     title : str, optional
         The title of the form. Default is None.
     collapsed : bool, optional
@@ -101,6 +179,10 @@ def dict_to_form(input_dict, title=None, collapsed=None, nested=False):
         Default is None.
     nested : bool, optional
         If True, the form will be nested. Default is False.
+    lazy_sections : list, optional
+        If a list is given, nested dictionaries are not built. Their (empty)
+        CollapsibleVBox is appended to the list instead and keeps the compiled
+        rows in its .spec attribute, see spec_to_rows. Default is None.
 
     Returns
     -------
@@ -109,6 +191,7 @@ def dict_to_form(input_dict, title=None, collapsed=None, nested=False):
     widgets_dict : dict
         A dictionary mapping field names to their corresponding widgets.
     """
+    rows = compile_spec(input_dict) if isinstance(input_dict, dict) else input_dict
     widgets_list = []
     widgets_dict = {}
 
@@ -117,36 +200,10 @@ def dict_to_form(input_dict, title=None, collapsed=None, nested=False):
         title_widget.add_class('ifk-form-title')
         widgets_list.append(title_widget)
 
-    for key, value in input_dict.items():
-        hbox_items = []
-        
-        # Case: nested tuple group
-        if isinstance(key, tuple) and isinstance(value, tuple):
-            for sub_key, sub_val in zip(key, value):
-                wid = create_widget(sub_key, sub_val)
-                widgets_dict[sub_key] = wid
-                hbox_items.append(wid)
-
-        elif isinstance(value, dict):
-            # Case: nested dictionary group
-            sub_vbox, sub_widgets_dict = dict_to_form(value, title=key, collapsed=True, nested=True)
-            widgets_dict.update(sub_widgets_dict)
-            hbox_items.append(sub_vbox)
-            
-        else:
-            wid = create_widget(key, value)
-            widgets_dict[key] = wid
-            hbox_items.append(wid)
-            
-        hbox = widgets.HBox(hbox_items)
-        hbox.add_class('ifk-form-hbox')
-        widgets_list.append(hbox)
+    widgets_list += spec_to_rows(rows, widgets_dict, lazy_sections)
         
     if collapsed is not None:
-        vbox = CollapsibleVBox(widgets_list, title=title, collapsed=collapsed)
-        vbox.toggle_button.add_class('ifk-form-toggle-button')
-        vbox.label.add_class('ifk-widget-label')
-        vbox.layout.width = '100%'
+        vbox = collapsible_section(widgets_list, title, collapsed)
     else:
         vbox = widgets.VBox(widgets_list)
 
@@ -154,10 +211,65 @@ def dict_to_form(input_dict, title=None, collapsed=None, nested=False):
 
     return vbox, widgets_dict
 
+#=====================================================================
+def spec_to_rows(rows, widgets_dict, lazy_sections=None):
+    """
+    Create the row widgets of a form from compiled rows.
+    :param rows: Rows as returned by spec.compile_spec.
+    :param widgets_dict: A dictionary the created field widgets are added to.
+    :param lazy_sections: If a list is given, nested sections are added to it as
+        empty CollapsibleVBox widgets instead of being built.
+    :return: A list of row widgets.
+    """
+    widgets_list = []
+    for row in rows:
+        hbox_items = []
+        for item in row:
+            if isinstance(item, Section) and lazy_sections is not None:
+                # Case: nested dictionary group, built on first expand
+                sub_vbox = collapsible_section(None, item.title, True)
+                sub_vbox.spec = item.rows
+                lazy_sections.append(sub_vbox)
+                hbox_items.append(sub_vbox)
+
+            elif isinstance(item, Section):
+                # Case: nested dictionary group
+                sub_vbox, sub_widgets_dict = dict_to_form(item.rows, title=item.title, collapsed=True, nested=True)
+                widgets_dict.update(sub_widgets_dict)
+                hbox_items.append(sub_vbox)
+                
+            else:
+                wid = create_field_widget(item)
+                widgets_dict[item.key] = wid
+                hbox_items.append(wid)
+            
+        hbox = widgets.HBox(hbox_items)
+        hbox.add_class('ifk-form-hbox')
+        widgets_list.append(hbox)
+
+    return widgets_list
+
+#=====================================================================
+def collapsible_section(children, title, collapsed):
+    """
+    Create a styled CollapsibleVBox for a form or a nested section.
+    :param children: The content widgets.
+    :param title: The title of the section.
+    :param collapsed: If True, the section is collapsed.
+    :return: A CollapsibleVBox.
+    """
+    vbox = CollapsibleVBox(children, title=title, collapsed=collapsed)
+    vbox.toggle_button.add_class('ifk-form-toggle-button')
+    vbox.label.add_class('ifk-widget-label')
+    vbox.layout.width = '100%'
+    return vbox
+
 #=====================================================================
 class Form(object):
     def __init__(self, input_dict, title=None, collapsed=None, max_width=600,
-                 mandatory=None, disable=None, hide=None, check=None, tooltips=None):
+                 mandatory=None, disable=None, hide=None, check=None, tooltips=None,
+                 depends_on=None, update_policy='immediate', wait_ms=150, lazy=False,
+                 validate_inactive=False, cache_checks=True, spec=None, deferred=False, namespace=None):
         """
         A class to create and manage interactive forms using ipywidgets.
 
@@ -185,6 +297,41 @@ class Form(object):
         check : dict, optional
             A dictionary where keys are field names and values are functions that
             return a boolean to validate the field's value. Default is None.
+        depends_on : dict, optional
+            A dictionary where keys are field names and values are lists of field names
+            that the conditions of this field read. Conditions of fields without an
+            entry are traced automatically on every evaluation. Default is None.
+        update_policy : str, optional
+            When conditions are re-evaluated after a value change. 'immediate' on every
+            change, 'debounce' once the input paused for wait_ms, 'throttle' at most once
+            every wait_ms. Delayed updates run on the kernel's event loop and are flushed
+            before check_and_return_values. Default is 'immediate'.
+        wait_ms : int, optional
+            The delay in milliseconds for the 'debounce' and 'throttle' policies. Default is 150.
+        lazy : bool, optional
+            If True, the widgets of nested (collapsed) sections are only created when the
+            section is expanded for the first time. Until then get_values returns the
+            defaults or values set with set_values for these fields. Default is False.
+        validate_inactive : bool, optional
+            If True, check_and_return_values also validates disabled and hidden fields,
+            which are not part of the returned values. Default is False.
+        cache_checks : bool, optional
+            If True, the result of a check is reused as long as the values it read are
+            unchanged. Set to False for checks that depend on external state (e.g. files
+            or the clock). Default is True.
+        spec : tuple, optional
+            The rows of input_dict compiled with spec.compile_spec, to skip parsing
+            input_dict again. Used by FormTemplate. Default is None.
+        deferred : bool, optional
+            If True, no field widgets are created until materialize() is called, the form
+            is displayed or shown on a page of a Masonry. Until then the form only keeps
+            its spec and values, get_values, set_values and check_and_return_values
+            work as for lazy sections. Default is False.
+        namespace : str, optional
+            The name of the form on a shared ValueBus, see join_bus and
+            Masonry(shared_values=True). Conditions can read the fields of other forms on
+            the bus as 'namespace.key'. Such conditions are skipped until the form joins
+            the bus. Default is None.
 
         Attributes
         ----------
@@ -192,118 +339,470 @@ class Form(object):
             The main container widget for the form.
         widgets_dict : dict
             A dictionary mapping field names to their corresponding widgets.
+            Fields of sections that were not expanded yet are missing if lazy=True.
+        values : mapping
+            A read-only, live view of the current field values.
+        bus : ValueBus or None
+            The shared value bus the form joined.
         """
         
         self.title = title
+        self.namespace = namespace
+        self.bus = None
+        self.closed = False
+        self._observers = []
+        self._actions = []
         self._input_dict = input_dict
         self._mandatory = mandatory
+        self._tooltips = tooltips or {}
+
+        # Specs and pending values of fields in sections that are not built yet
+        self._lazy_specs = {}
+        self._lazy_values = {}
+        self._lazy_states = {}
+        self._lazy = lazy
+        lazy_sections = [] if lazy else None
 
-        self.vbox, self.widgets_dict = dict_to_form(input_dict, title=title, collapsed=collapsed)
+        self._spec = spec if spec is not None else compile_spec(input_dict)
+        if deferred:
+            # Only the frame (title, collapse button), the rows are built by materialize
+            self.vbox, self.widgets_dict = dict_to_form((), title=title, collapsed=collapsed)
+            self.vbox.spec = self._spec
+            lazy_sections = [self.vbox]
+        else:
+            self.vbox, self.widgets_dict = dict_to_form(self._spec, title=title, collapsed=collapsed,
+                                                        lazy_sections=lazy_sections)
         self.vbox.layout.max_width = f'{max_width}px'
+        for section in lazy_sections or []:
+            self._add_lazy_section(section)
 
-        if isinstance(mandatory, list):
-            for key in mandatory:
-                wid = self.widgets_dict[key]
-                wid.label.value = f"{wid.label.value} *"
+        self._set_mandatory_labels(self.widgets_dict)
+
+        self.profiler = None
+        self._schema_hash = None
+        self._pending_keys = set()
+        # Changed keys of other forms on the bus, as 'namespace.key'
+        self._pending_bus_keys = set()
+        # Keys of other forms read by conditions before the form joined a bus
+        self._foreign_keys = set()
+        self._batch_depth = 0
+        self._scheduler = None
+        if update_policy in ('debounce', 'throttle'):
+            self._scheduler = Debouncer(self._flush_pending, wait_ms / 1000, mode=update_policy)
+        elif update_policy != 'immediate':
+            print(f"Warning: Unknown update_policy '{update_policy}'. Using 'immediate' instead.")
 
-        self._disable_conditions = self.add_observer(disable, self.update_disable)
-        self._hide_conditions = self.add_observer(hide, self.update_hide)
-        self._check_conditions = self.add_observer(check, self.update_check)
+        # Widget-free rule logic, shared with batch validation
+        self.rules = RuleSet(mandatory, disable, hide, check, depends_on,
+                             keys=set(self.widgets_dict) | set(self._lazy_specs),
+                             validate_inactive=validate_inactive, cache_checks=cache_checks)
+        # Live values of all fields, kept up to date by the observers
+        self._values = self._collect_values()
+        self.values = MappingProxyType(self._values)
+        # The values conditions read, a BusView once the form joined a bus
+        self._condition_values = self.values
+        self.add_observer(self._on_value_change)
 
-        # Set initial state for disable and hide conditions
-        self.update_check()
-        self.update_disable()
-        self.update_hide()
+        # Set initial state for check, disable and hide conditions. Conditions that
+        # read other forms ('namespace.key') are evaluated again by join_bus.
+        self.update()
 
         self.set_tooltips(tooltips)
+        # The observers of the open widgets keep the form alive (e.g. Form(...).display()
+        # without a reference) until close detaches them
+        _live_forms.add(self)
+
+    #=====================================================================
+    def _set_mandatory_labels(self, keys):
+        """
+        Mark the labels of mandatory fields with an asterisk.
+        :param keys: The keys of the fields to mark, if they are mandatory.
+        """
+        if isinstance(self._mandatory, list):
+            for key in self._mandatory:
+                if key in keys:
+                    wid = self.widgets_dict[key]
+                    wid.label.value = f"{wid.label.value} *"
+
+    #=====================================================================
+    def _add_lazy_section(self, section):
+        """
+        Register a section whose widgets are created on its first expand.
+        :param section: A CollapsibleVBox with the section dictionary in .spec,
+            or the VBox of a deferred form.
+        """
+        section.builder = partial(self._build_section, section)
+        for field in iter_fields(section.spec):
+            self._lazy_specs[field.key] = field
 
     #=====================================================================
-    def add_observer(self, conditions, func):
+    def _build_section(self, section):
         """
-        Add observers to the widgets based on the provided conditions.
+        Create the widgets of a lazy section and hook them into the form.
+        :param section: A CollapsibleVBox with the section dictionary in .spec.
+        :return: The rows of the section.
+        """
+        new_widgets = {}
+        sub_sections = [] if self._lazy or section is not self.vbox else None
+        rows = spec_to_rows(section.spec, new_widgets, sub_sections)
+        if section is self.vbox:
+            # Submit buttons stay below the rows of a deferred form
+            rows += [action.box for action in self._actions]
+        self.widgets_dict.update(new_widgets)
+        for sub_section in sub_sections or []:
+            self._add_lazy_section(sub_section)
+
+        for key, wid in new_widgets.items():
+            self._lazy_specs.pop(key, None)
+            self._lazy_states.pop(key, None)
+            value = self._lazy_values.pop(key, NO_VALUE)
+            if value is not NO_VALUE:
+                wid.wid.value = value
+
+        self._set_mandatory_labels(new_widgets)
+        self.set_tooltips({key: tip for key, tip in self._tooltips.items() if key in new_widgets})
+        self._set_profiler(new_widgets)
+        self.add_observer(self._on_value_change, new_widgets)
+        self.update(self.rules.nodes(new_widgets))
+        return rows
+
+    #=====================================================================
+    @property
+    def materialized(self):
+        """
+        False while the field widgets of a deferred form are not created yet.
+        """
+        return getattr(self.vbox, 'builder', None) is None
+
+    #=====================================================================
+    def materialize(self):
+        """
+        Create the field widgets of a deferred form. Does nothing if they exist already.
+        """
+        if isinstance(self.vbox, CollapsibleVBox):
+            self.vbox.materialize()
+        elif not self.materialized:
+            builder, self.vbox.builder = self.vbox.builder, None
+            footer = [action.box for action in self._actions]
+            children = [child for child in self.vbox.children if child not in footer]
+            self.vbox.children = (*children, *builder())
+
+    #=====================================================================
+    def add_observer(self, func, keys=None):
+        """
+        Add an observer to the widgets of the form. The open widgets keep func (and
+        its object) alive until close detaches all observers.
+        :param func: The function to call with the key and the change when a widget value changes.
+        :param keys: The keys of the widgets to observe. Default is all.
+
+        The former call add_observer(conditions, func) is still supported but deprecated:
+        func(change) is called when any widget changes and a dictionary of widgets and
+        their condition functions is returned.
+        """
+        if not callable(func) and callable(keys):
+            print("Warning: add_observer(conditions, func) is deprecated. Use add_observer(func, keys) instead.")
+            return self._add_condition_observer(func, keys)
+
+        for key in self.widgets_dict if keys is None else keys:
+            wid = self.widgets_dict[key].wid
+            callback = partial(func, key)
+            wid.observe(callback, names='value')
+            self._observers.append((wid, callback))
+
+    #=====================================================================
+    def _add_condition_observer(self, conditions, func):
+        """
+        Former add_observer: observe all widgets with func.
         :param conditions: A dictionary of widget keys and corresponding functions.
-        :param func: The function to call when the widget value changes.
+        :param func: The function to call with the change when a widget value changes.
         :return: A dictionary of widgets and their corresponding functions.
         """
-        # Store conditions as a dictionary of widgets and functions
         conditions_out = {}
         if isinstance(conditions, dict):
             for key, val in conditions.items():
-                if key in self.widgets_dict:
-                    if callable(val):
-                        wid = self.widgets_dict[key]
-                        conditions_out[wid] = val
+                if key in self.widgets_dict and callable(val):
+                    conditions_out[self.widgets_dict[key]] = val
 
-            # The function will be called when any of the widgets change
             for key, wid in self.widgets_dict.items():
                 wid.wid.observe(func, names='value')
+                self._observers.append((wid.wid, func))
         elif conditions:
             print(f"Warning: Conditions should be a dictionary. Got {type(conditions).__name__} instead.")
 
         return conditions_out
-        
+
     #=====================================================================
-    #@throttle(0.2)
-    def update_disable(self, change=None):
+    def _on_value_change(self, key, change=None):
         """
-        Update the disable state of the widgets based on the provided conditions.
-        :param change: is provided by observe, but not used here.
+        Single dispatcher for value changes: re-evaluate only the conditions
+        that depend on the changed key and apply the resulting widget states.
+        :param key: The key of the widget that changed.
+        :param change: is provided by observe, the new value is stored.
         """
-        value_dict = self.get_values()
-        for wid, condition in self._disable_conditions.items():
-            try:
-                disable = condition(value_dict)
-                wid.wid.disabled = disable
+        if self.profiler is not None:
+            with self.profiler.event(f'change:{key}'):
+                return self._dispatch(key, change)
+        return self._dispatch(key, change)
 
-                if disable:
-                    wid.wid.add_class('ifk-widget-input-disabled')
-                else:
-                    wid.wid.remove_class('ifk-widget-input-disabled')
+    #=====================================================================
+    def _dispatch(self, key, change=None):
+        if change is not None:
+            self._values[key] = change['new']
 
-            except Exception as e:
-                print(f"Error updating disable state for {wid.label.value}\n{type(e).__name__}:{e}")
+        if self._batch_depth:
+            # Collected and evaluated once at the end of the batch
+            self._pending_keys.add(key)
+            return
 
+        if self._scheduler is not None:
+            self._pending_keys.add(key)
+            self._scheduler()
+            return
+
+        affected = self.rules.affected([key])
+        if affected:
+            self.update(affected)
+        if self.bus is not None:
+            self.bus.publish(self.namespace, (key,))
 
     #=====================================================================
-    #@throttle(0.2)
-    def update_hide(self, change=None):
+    def _flush_pending(self):
         """
-        Update the display state of the widgets based on the provided conditions.
+        Re-evaluate the conditions affected by all keys changed since the last update.
+        """
+        keys, self._pending_keys = self._pending_keys, set()
+        bus_keys, self._pending_bus_keys = self._pending_bus_keys, set()
+        affected = self.rules.affected(keys) | self.rules.affected(bus_keys, wildcard=False)
+        if affected and self.profiler is not None:
+            with self.profiler.event('flush'):
+                self.update(affected)
+        elif affected:
+            self.update(affected)
+        if self.bus is not None:
+            self.bus.publish(self.namespace, keys)
+
+    #=====================================================================
+    def join_bus(self, bus, namespace=None, update=True):
+        """
+        Share the values of the form on a ValueBus. Conditions can then read the
+        fields of the other forms on the bus as 'namespace.key', and are only
+        re-evaluated when a field they read changes.
+        :param bus: The ValueBus.
+        :param namespace: The name of the form on the bus. Default is the namespace
+            passed to the form.
+        :param update: If True, all conditions are evaluated. When several forms join,
+            pass False and call update() once all of them joined. Default is True.
+        """
+        if namespace is not None:
+            self.namespace = namespace
+        if self.namespace is None:
+            raise ValueError("A namespace is required to join a value bus.")
+        self._condition_values = bus.join(self.namespace, self.values, self._on_bus_change)
+        self.bus = bus
+        self._foreign_keys.clear()
+        if update:
+            self.update()
+
+    #=====================================================================
+    def leave_bus(self):
+        """
+        Stop sharing the values of the form, conditions only read its own values again.
+        """
+        if self.bus is not None:
+            self.bus.leave(self.namespace)
+            self.bus = None
+            self._condition_values = self.values
+
+    #=====================================================================
+    def _on_bus_change(self, keys):
+        """
+        Re-evaluate the conditions that read changed fields of another form.
+        :param keys: The changed keys as 'namespace.key'.
+        """
+        if self._batch_depth or self._scheduler is not None:
+            self._pending_bus_keys |= keys
+            if not self._batch_depth:
+                self._scheduler()
+            return
+
+        affected = self.rules.affected(keys, wildcard=False)
+        if affected:
+            self.update(affected)
+
+    #=====================================================================
+    @contextmanager
+    def batch(self):
+        """
+        Context manager for bulk changes: value changes inside the block only
+        record the changed keys, the affected conditions are evaluated once
+        (and their widget states applied in one batch) when the block exits.
+        Batches can be nested.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._flush_pending()
+
+    #=====================================================================
+    def flush(self):
+        """
+        Immediately apply condition updates delayed by the update_policy.
+        """
+        if self._scheduler is not None:
+            self._scheduler.flush()
+
+    #=====================================================================
+    def update(self, nodes=None, value_dict=None):
+        """
+        Evaluate conditions and apply the resulting widget states in one batch.
+        :param nodes: Iterable of (kind, key) pairs to evaluate. Default is all conditions.
+        :param value_dict: Snapshot of the form values. Default are the live form values.
+        """
+        if value_dict is None:
+            value_dict = self._condition_values
+
+        errors = []
+        states = self.rules.evaluate_states(value_dict, nodes, errors=errors)
+        for kind, key, e in errors:
+            if self._reads_other_form(e):
+                # Evaluated again when the form joins a value bus, see display
+                self._foreign_keys.add(e.args[0])
+                continue
+            label = self.widgets_dict[key].label.value if key in self.widgets_dict else key
+            print(f"Error updating {kind} state for {label}\n{type(e).__name__}:{e}")
+
+        self._apply_states(states)
+
+    #=====================================================================
+    def _reads_other_form(self, e):
+        """
+        :param e: The exception of a condition.
+        :return: True if the form is not on a value bus and the condition read a
+            'namespace.key' of another form.
+        """
+        key = e.args[0] if isinstance(e, KeyError) and e.args else None
+        return self.bus is None and isinstance(key, str) and '.' in key and key not in self._values
+
+    #=====================================================================
+    def _apply_states(self, states):
+        """
+        Apply widget states, sending only actual changes and one message per widget.
+        :param states: A dictionary mapping field keys to dictionaries with the
+            optional entries 'check', 'disable' and 'hide'.
+        """
+        with ExitStack() as stack:
+            for key, state in states.items():
+                if key not in self.widgets_dict:
+                    # Field of a section that is not built yet
+                    self._lazy_states.setdefault(key, {}).update(state)
+                    continue
+
+                wid = self.widgets_dict[key]
+                classes = list(wid.wid._dom_classes)
+
+                if 'disable' in state:
+                    disable = state['disable']
+                    # Labels (empty tuples, unsupported types) have no disabled trait
+                    if getattr(wid.wid, 'disabled', disable) != disable:
+                        stack.enter_context(wid.wid.hold_sync())
+                        wid.wid.disabled = disable
+                    toggle_class(classes, 'ifk-widget-input-disabled', disable)
+
+                if 'check' in state:
+                    toggle_class(classes, 'ifk-widget-input-error', not state['check'])
+
+                if classes != list(wid.wid._dom_classes):
+                    stack.enter_context(wid.wid.hold_sync())
+                    wid.wid._dom_classes = classes
+
+                if 'hide' in state:
+                    display = 'none' if state['hide'] else 'block'
+                    if wid.layout.display != display:
+                        stack.enter_context(wid.layout.hold_sync())
+                        wid.layout.display = display
+
+    #=====================================================================
+    def update_disable(self, change=None, keys=None, value_dict=None):
+        """
+        Update the disable state of the widgets based on the provided conditions.
         :param change: is provided by observe, but not used here.
+        :param keys: Only update the conditions of these keys. Default is all.
+        :param value_dict: Snapshot of the form values. Default are the live form values.
         """
-        value_dict = self.get_values()
-        for wid, condition in self._hide_conditions.items():
-            try:
-                hide = condition(value_dict)
-                if hide:
-                    wid.layout.display = 'none'
-                else:
-                    wid.layout.display = 'block'
+        keys = self.rules.conditions['disable'] if keys is None else keys
+        self.update([('disable', key) for key in keys], value_dict)
 
-            except Exception as e:
-                print(f"Error updating hide state for {wid.label.value}\n{type(e).__name__}:{e}")
+    #=====================================================================
+    def update_hide(self, change=None, keys=None, value_dict=None):
+        """
+        Update the display state of the widgets based on the provided conditions.
+        :param change: is provided by observe, but not used here.
+        :param keys: Only update the conditions of these keys. Default is all.
+        :param value_dict: Snapshot of the form values. Default are the live form values.
+        """
+        keys = self.rules.conditions['hide'] if keys is None else keys
+        self.update([('hide', key) for key in keys], value_dict)
 
-        
     #=====================================================================
-    #@throttle(0.2)
-    def update_check(self, change=None):
+    def update_check(self, change=None, keys=None, value_dict=None):
         """
         Update the check state of the widgets based on the provided conditions.
         :param change: is provided by observe, but not used here.
+        :param keys: Only update the conditions of these keys. Default is all.
+        :param value_dict: Snapshot of the form values. Default are the live form values.
         """
-        value_dict = self.get_values()
-        for wid, condition in self._check_conditions.items():
-            try:
-                check = condition(value_dict)
-                if check:
-                    wid.wid.remove_class('ifk-widget-input-error')
-                else:
-                    wid.wid.add_class('ifk-widget-input-error')
-
-            except Exception as e:
-                print(f"Error updating check state for {wid.label.value}\n{type(e).__name__}:{e}")
+        keys = self.rules.conditions['check'] if keys is None else keys
+        self.update([('check', key) for key in keys], value_dict)
 
     
+    #=====================================================================
+    def enable_profiling(self, hooks=None):
+        """
+        Start recording call counts and latencies of conditions, change events (including
+        the number of comm messages they send), get_values and FileAutocomplete lookups.
+        :param hooks: Optional list of functions called as hook(name, value, unit) for
+            every measurement, see profiling.Profiler.
+        :return: The Profiler.
+        """
+        from .profiling import Profiler
+        self.profiler = Profiler(hooks)
+        self.rules.profiler = self.profiler
+        self._set_profiler(self.widgets_dict)
+        return self.profiler
+
+    #=====================================================================
+    def disable_profiling(self):
+        """
+        Stop recording, the collected data stays available in the returned Profiler.
+        :return: The Profiler or None.
+        """
+        profiler = self.profiler
+        self.profiler = self.rules.profiler = None
+        self._set_profiler(self.widgets_dict)
+        return profiler
+
+    #=====================================================================
+    def _set_profiler(self, keys):
+        for key in keys:
+            wid = self.widgets_dict[key].wid
+            if isinstance(wid, FileAutocomplete):
+                wid.profiler = self.profiler
+
+    #=====================================================================
+    def profile_report(self, as_table=False):
+        """
+        Return the data collected since enable_profiling.
+        :param as_table: If True, return a text table instead of a dictionary.
+        :return: See profiling.Profiler.report and profiling.Profiler.table.
+        """
+        if self.profiler is None:
+            print("Warning: Profiling is not enabled. Call enable_profiling() first.")
+            return None
+        return self.profiler.table() if as_table else self.profiler.report()
+
     #=====================================================================
     def set_tooltips(self, tooltips):
         """
@@ -313,7 +812,10 @@ class Form(object):
         """
         if tooltips:
             for key, tip in tooltips.items():
-                if key in self.widgets_dict:
+                if key in self._lazy_specs:
+                    # Applied when the section is built
+                    continue
+                elif key in self.widgets_dict:
                     wid = self.widgets_dict[key]
                     tooltip = widgets.HTML(f'<div class="ifk-tooltip">?<span class="ifk-tooltip-text">{tip}</span></div>')
                     hbox = widgets.HBox([wid.label, tooltip])
@@ -328,8 +830,13 @@ class Form(object):
     #=====================================================================
     def display(self):
         """
-        Display the form in the notebook.
+        Display the form in the notebook. Warns about conditions that read other
+        forms if the form is not on a value bus, e.g. because of a mistyped key.
         """
+        if self.bus is None:
+            for key in sorted(self._foreign_keys):
+                print(f"Warning: {key} is not a valid key in the form. Conditions reading other forms are skipped until the form joins a value bus.")
+        self.materialize()
         items = [self.vbox, *load_stylesheets()]
         display(*items)
 
@@ -337,17 +844,35 @@ class Form(object):
     def get_values(self):
         """
         Get the values of the widgets in the form as a dictionary.
+        For read-only access without a copy use the .values mapping.
+        :return: A dictionary of key-value pairs representing the widget values.
+        """
+        if self.profiler is not None:
+            with self.profiler.measure('get_values'):
+                return dict(self._values)
+        return dict(self._values)
+
+    #=====================================================================
+    def _collect_values(self):
+        """
+        Read the values of all widgets and of the fields of sections that are not built yet.
         :return: A dictionary of key-value pairs representing the widget values.
         """
         out = {key: wid.wid.value for key, wid in self.widgets_dict.items() if hasattr(wid.wid, 'value')}
+        for key, field in self._lazy_specs.items():
+            value = self._lazy_values.get(key, field.default)
+            if value is not NO_VALUE:
+                out[key] = value
         return out
     
     #=====================================================================
-    def set_values(self, values, verbose=True):
+    def set_values(self, values, verbose=True, batch=True):
         """
         Set the values of the widgets in the form.
         :param values: A dictionary of key-value pairs to set the widget values.
         :param verbose: If True, print warnings for invalid keys.
+        :param batch: If True, conditions are evaluated once after all values are set
+            instead of after every single value, see batch().
         """
         def set_key(key, value):
             if key in self.widgets_dict:
@@ -362,18 +887,33 @@ class Form(object):
                         print(f"Warning: Type mismatch for {key}. Expected {type(wid.wid.value)}, got {type(value)}.")
                 elif value:
                     print(f"Warning: {key} is not a valid widget.")
+            elif key in self._lazy_specs:
+                # Field of a section that is not built yet
+                if isinstance(value, (tuple, list)):
+                    value = value[0]
+
+                default = self._lazy_specs[key].default
+                if default is NO_VALUE:
+                    if value:
+                        print(f"Warning: {key} is not a valid widget.")
+                elif type(default) == type(value):
+                    self._lazy_values[key] = value
+                    self._on_value_change(key, {'new': value})
+                else:
+                    print(f"Warning: Type mismatch for {key}. Expected {type(default)}, got {type(value)}.")
             elif verbose:
                 print(f"Warning: {key} is not a valid key in the form.")
 
-        for key, value in values.items():
-            if isinstance(key, (tuple, list)):
-                for sub_key, sub_value in zip(key, value):
-                    set_key(sub_key, sub_value)
-            elif isinstance(value, dict):
-                for sub_key, sub_value in value.items():
-                    set_key(sub_key, sub_value)
-            else:
-                set_key(key, value)
+        with self.batch() if batch else nullcontext():
+            for key, value in values.items():
+                if isinstance(key, (tuple, list)):
+                    for sub_key, sub_value in zip(key, value):
+                        set_key(sub_key, sub_value)
+                elif isinstance(value, dict):
+                    for sub_key, sub_value in value.items():
+                        set_key(sub_key, sub_value)
+                else:
+                    set_key(key, value)
     
     #=====================================================================
     def check_and_return_values(self):
@@ -381,41 +921,207 @@ class Form(object):
         Check the values of the widgets in the form and return them as a dictionary.
         :return: A dictionary of key-value pairs representing the widget values, or None if validation fails.
         """
-        out = {}
-        abort = False
+        self.flush()
         value_dict = self.get_values()
+
+        # Actual disable/hide state of the widgets, conditions were applied by update
+        states = {}
+        for key in value_dict:
+            wid = self.widgets_dict.get(key)
+            if wid is not None:
+                disabled = getattr(wid.wid, 'disabled', 'ifk-widget-input-disabled' in wid.wid._dom_classes)
+                states[key] = {'disable': disabled, 'hide': wid.layout.display == 'none'}
+            else:
+                # Field of a section that is not built yet
+                states[key] = self._lazy_states.get(key, {})
+
+        result = self.rules.validate(self._condition_values, states, kinds=('check',))
+        for key, reason, message in result.errors:
+            print(message)
+
+        missing = set(result.missing)
         for key, wid in self.widgets_dict.items():
-            if hasattr(wid.wid, 'value'):
-                value = wid.wid.value
-                disabled = wid.wid.disabled
-                hidden = wid.layout.display == 'none'
-                mandatory = key in self._mandatory if self._mandatory else False
-                check_func = self._check_conditions.get(wid, lambda d:True)
-                valid = check_func(value_dict)
-                
-                if value == '' and mandatory:
-                    print(f"Mandatory field '{key}' is empty.")
-                    wid.wid.add_class('ifk-widget-input-missing')
-                    abort = True
-                else:
-                    wid.wid.remove_class('ifk-widget-input-missing')
-                    
-                if not valid:
-                    print(f"Invalid input in field '{key}'.")
-                    abort = True
-                
-                if not (disabled or hidden):
-                    out[key] = value
-                    
-        if abort:
-            return None
+            if key in missing:
+                wid.wid.add_class('ifk-widget-input-missing')
+            elif key in value_dict:
+                wid.wid.remove_class('ifk-widget-input-missing')
+
+        if result.valid:
+            return result.values
         else:
-            return out
-    
+            return None
+
+    #=====================================================================
+    def add_submit(self, func, executor='thread', label='Submit', max_pending=0, coalesce=False, on_done=None):
+        """
+        Add a submit button below the form. It validates the input with
+        check_and_return_values and runs func(values) in the background, with a
+        progress bar, status text and a cancel button. See SubmitAction for the parameters.
+        :return: The SubmitAction.
+        """
+        action = SubmitAction(self.check_and_return_values, func, executor, label, max_pending,
+                              coalesce, on_done)
+        self._actions.append(action)
+        container = self.vbox.content_box if isinstance(self.vbox, CollapsibleVBox) else self.vbox
+        container.children = (*container.children, action.box)
+        return action
+
+    #=====================================================================
+    def close(self):
+        """
+        Close all widgets of the form and detach its observers, e.g. before a notebook
+        cell creates the form again. The shared stylesheet widget stays open.
+        Values remain readable with get_values.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        for action in self._actions:
+            action.close()
+        if self._scheduler is not None:
+            self._scheduler.cancel_timer()
+        self._pending_keys.clear()
+        for wid, callback in self._observers:
+            wid.unobserve(callback, names='value')
+        self._observers.clear()
+        close_widgets(self.vbox)
+        self.leave_bus()
+        _live_forms.discard(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    #=====================================================================
+    @property
+    def schema_hash(self):
+        """
+        Hash of the form spec, stored with saved states, see state.schema_hash.
+        """
+        if self._schema_hash is None:
+            self._schema_hash = schema_hash(self._spec)
+        return self._schema_hash
+
+    #=====================================================================
+    def get_state(self):
+        """
+        :return: A serializable dictionary with the values of the form and its schema hash.
+        """
+        state = make_state(self._spec, self._values)
+        state['schema'] = self.schema_hash
+        return state
+
+    #=====================================================================
+    def set_state(self, state, verbose=True):
+        """
+        Restore values from a dictionary returned by get_state, with a single update of
+        the conditions. If the schema hash matches, the values are assigned without
+        checks. Otherwise they are matched to the current fields key by key.
+        :param state: The state dictionary.
+        :param verbose: If True, print warnings for values that can not be restored.
+        """
+        if state.get('schema') != self.schema_hash:
+            if verbose:
+                print("Warning: The form changed since the state was saved. Restoring the values key by key.")
+            self.set_values(migrate_values(state, self._spec, verbose), verbose=verbose)
+            return
+
+        with self.batch():
+            for key, value in decode_values(state).items():
+                if key in self.widgets_dict:
+                    self.widgets_dict[key].wid.value = value
+                elif key in self._lazy_specs:
+                    self._lazy_values[key] = value
+                    self._on_value_change(key, {'new': value})
+
+    #=====================================================================
+    def save_state(self, path, format=None):
+        """
+        Save the values of the form to a file.
+        :param path: The file path.
+        :param format: 'json' or 'msgpack' (requires the msgpack package). Default is
+            msgpack for .msgpack/.mpk files and json otherwise.
+        """
+        write_state(path, self.get_state(), format)
+
+    #=====================================================================
+    def load_state(self, path, format=None, verbose=True):
+        """
+        Restore the values of the form from a file written by save_state, see set_state.
+        :param path: The file path.
+        :param format: 'json' or 'msgpack'. Default is chosen by the file extension.
+        :param verbose: If True, print warnings for values that can not be restored.
+        """
+        self.set_state(read_state(path, format), verbose)
+
+
+#=====================================================================
+class FormTemplate(object):
+    def __init__(self, input_dict, **kwargs):
+        """
+        A form definition that is parsed once and creates any number of forms.
+
+        Parameters
+        ----------
+        input_dict : dict
+            A dictionary containing the input fields and their default values, see Form.
+        **kwargs
+            Further arguments of Form (title, mandatory, disable, hide, check, ...).
+
+        Attributes
+        ----------
+        spec : tuple
+            The compiled rows of input_dict, see spec.compile_spec.
+        """
+        self.input_dict = input_dict
+        self.kwargs = kwargs
+        self.spec = compile_spec(input_dict)
+
+    #=====================================================================
+    def instantiate(self, values=None, **kwargs):
+        """
+        Create a new form from the compiled spec.
+        :param values: Optional dictionary of values. The widgets are created with these
+            values, so no further messages and condition updates are needed.
+        :param kwargs: Arguments of Form that override those of the template.
+        :return: A Form.
+        """
+        spec, rest = self._with_values(self.spec, dict(values or {}))
+        form = Form(self.input_dict, spec=spec, **{**self.kwargs, **kwargs})
+        if rest:
+            # Values that need the checks and warnings of set_values
+            form.set_values(rest)
+        return form
+
+    #=====================================================================
+    @classmethod
+    def _with_values(cls, rows, values):
+        """
+        Replace the defaults of the fields by values of the same type.
+        :param rows: Compiled rows.
+        :param values: A dictionary of values, used values are removed from it.
+        :return: The new rows and the remaining values.
+        """
+        out = []
+        for row in rows:
+            items = []
+            for item in row:
+                if isinstance(item, Section):
+                    item = item._replace(rows=cls._with_values(item.rows, values)[0])
+                elif item.key in values and item.default is not NO_VALUE:
+                    value = values[item.key]
+                    if type(value) == type(item.default) and (item.kind not in ('dropdown', 'searchable')
+                                                              or value in item.value):
+                        item = item._replace(default=values.pop(item.key))
+                items.append(item)
+            out.append(tuple(items))
+        return tuple(out), values
 
 #=====================================================================
 class Masonry(object):
-    def __init__(self, forms):
+    def __init__(self, forms, page_size=None, paging='pages', shared_values=False):
         """
         Create a masonry layout with the provided forms.
 
@@ -423,6 +1129,18 @@ class Masonry(object):
         ----------
         forms : list of Form
             A list of Form objects to be displayed in the masonry layout.
+        page_size : int, optional
+            If given, only page_size forms are shown at once and only the shown forms
+            are materialized, see Form(deferred=True). Default is None (all forms).
+        paging : str, optional
+            How further pages are reached if page_size is given. 'pages' shows one page
+            with previous/next buttons, 'tabs' one tab per page and 'more' a button that
+            appends the next page. Default is 'pages'.
+        shared_values : bool, optional
+            If True, all forms join one ValueBus, so their conditions can read the fields
+            of the other forms as 'namespace.key'. The namespace of a form is the one passed
+            to Form, else its title, else 'form<index>'. A change is dispatched once and
+            only re-evaluates the conditions that read it. Default is False.
 
         Attributes
         ----------
@@ -430,15 +1148,215 @@ class Masonry(object):
             The list of Form objects.
         box : ipywidgets.Box
             The main container widget for the masonry layout.
+        page : int
+            The index of the page shown last.
+        actions : list of SubmitAction
+            The submit buttons added with add_submit, displayed below the box.
+        bus : ValueBus or None
+            The shared values of the forms if shared_values is True.
         """
         self.forms = forms
-        self.box = widgets.Box([form.vbox for form in forms])
-        self.box.add_class('ifk-masonry')
-        
+        self.closed = False
+        self.actions = []
+        _live_masonries.add(self)
+        self.bus = None
+        if shared_values:
+            self.bus = ValueBus()
+            for i, form in enumerate(forms):
+                namespace = form.namespace or form.title
+                if not namespace or namespace in self.bus.stores or self.bus.separator in namespace:
+                    if namespace:
+                        print(f"Warning: Namespace '{namespace}' is not unique or contains '{self.bus.separator}'. Using 'form{i}' instead.")
+                    namespace = f'form{i}'
+                form.join_bus(self.bus, namespace, update=False)
+            # Once all forms joined, so conditions can read any of them
+            for form in forms:
+                form.update()
+        self.page_size = page_size
+        self.paging = paging
+        self.page = 0
+
+        if page_size is None:
+            for form in forms:
+                form.materialize()
+            self.box = self._masonry_box(forms)
+            return
+
+        if paging not in ('pages', 'tabs', 'more'):
+            print(f"Warning: Unknown paging '{paging}'. Using 'pages' instead.")
+            self.paging = paging = 'pages'
+
+        if paging == 'tabs':
+            self.box = widgets.Tab([widgets.Box() for _ in range(self.n_pages)])
+            for page in range(self.n_pages):
+                first, last = self._page_range(page)
+                self.box.set_title(page, f"{first + 1}-{last}")
+            self.box.observe(lambda change: self.show_page(change['new']), names='selected_index')
+
+        elif paging == 'more':
+            self._masonry = self._masonry_box([])
+            self._more_button = widgets.Button(description='Load more')
+            self._more_button.on_click(lambda b: self.show_page(self.page + 1))
+            self.box = widgets.VBox([self._masonry, self._more_button])
+
+        else:
+            self._masonry = self._masonry_box([])
+            self._prev_button = widgets.Button(description='\u25C0', layout=widgets.Layout(width='40px'))
+            self._next_button = widgets.Button(description='\u25B6', layout=widgets.Layout(width='40px'))
+            self._page_label = widgets.Label()
+            self._prev_button.on_click(lambda b: self.show_page(self.page - 1))
+            self._next_button.on_click(lambda b: self.show_page(self.page + 1))
+            navigation = widgets.HBox([self._prev_button, self._page_label, self._next_button])
+            navigation.layout.align_items = 'center'
+            self.box = widgets.VBox([self._masonry, navigation])
+
+        self.show_page(0)
+
+    #=====================================================================
+    @staticmethod
+    def _masonry_box(forms):
+        box = widgets.Box([form.vbox for form in forms])
+        box.add_class('ifk-masonry')
+        return box
+
+    #=====================================================================
+    @property
+    def n_pages(self):
+        """
+        The number of pages, 1 without paging.
+        """
+        if self.page_size is None:
+            return 1
+        return max(1, -(-len(self.forms) // self.page_size))
+
+    #=====================================================================
+    def _page_range(self, page):
+        first = page * self.page_size
+        return first, min(first + self.page_size, len(self.forms))
+
+    #=====================================================================
+    def show_page(self, page):
+        """
+        Show a page of forms and materialize its forms. In 'more' mode all
+        pages up to this one are shown.
+        :param page: The page index, starting at 0.
+        """
+        if self.page_size is None:
+            return
+        page = min(max(page, 0), self.n_pages - 1)
+        first, last = self._page_range(page)
+        if self.paging == 'more':
+            first = 0
+        forms = self.forms[first:last]
+        for form in forms:
+            form.materialize()
+
+        if self.paging == 'tabs':
+            if not self.box.children[page].children:
+                self.box.children[page].children = [self._masonry_box(forms)]
+            if self.box.selected_index != page:
+                self.box.selected_index = page
+        elif self.paging == 'more':
+            self._masonry.children = [form.vbox for form in forms]
+            self._more_button.layout.display = 'none' if page == self.n_pages - 1 else None
+        else:
+            self._masonry.children = [form.vbox for form in forms]
+            self._page_label.value = f"Page {page + 1} of {self.n_pages}"
+            self._prev_button.disabled = page == 0
+            self._next_button.disabled = page == self.n_pages - 1
+        self.page = page
+
+    #=====================================================================
+    def close(self):
+        """
+        Close all forms and the widgets of the layout, see Form.close.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        for action in self.actions:
+            action.close()
+        for form in self.forms:
+            form.close()
+        close_widgets(self.box)
+        _live_masonries.discard(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    #=====================================================================
+    def save_state(self, path, format=None):
+        """
+        Save the values of all forms to one file, see Form.save_state.
+        :param path: The file path.
+        :param format: 'json' or 'msgpack'. Default is chosen by the file extension.
+        """
+        write_state(path, {'forms': [form.get_state() for form in self.forms]}, format)
+
+    #=====================================================================
+    def load_state(self, path, format=None, verbose=True):
+        """
+        Restore the values of all forms from a file written by save_state.
+        :param path: The file path.
+        :param format: 'json' or 'msgpack'. Default is chosen by the file extension.
+        :param verbose: If True, print warnings for values that can not be restored.
+        """
+        states = read_state(path, format).get('forms', [])
+        if len(states) != len(self.forms) and verbose:
+            print(f"Warning: The file contains {len(states)} forms, the masonry has {len(self.forms)}.")
+        for form, state in zip(self.forms, states):
+            form.set_state(state, verbose)
+
+    #=====================================================================
+    def add_submit(self, func, executor='thread', label='Submit', max_pending=0, coalesce=False, on_done=None):
+        """
+        Add a submit button for all forms. It validates every form and runs
+        func(values) in the background, where values is the list of the values
+        of all forms. See SubmitAction for the parameters.
+        :return: The SubmitAction.
+        """
+        action = SubmitAction(self._check_all, func, executor, label, max_pending, coalesce, on_done)
+        self.actions.append(action)
+        return action
+
+    def _check_all(self):
+        values = [form.check_and_return_values() for form in self.forms]
+        return None if any(form_values is None for form_values in values) else values
+
     #=====================================================================
     def display(self):
         """
         Display the masonry layout in the notebook.
         """
-        items = [self.box, *load_stylesheets()]
-        display(*items)
\ No newline at end of file
+        items = [self.box, *(action.box for action in self.actions), *load_stylesheets()]
+        display(*items)
+
+#=====================================================================
+def widget_counts():
+    """
+    Count the open widgets of the kernel, e.g. to find forms that were not closed
+    when a notebook cell was executed again.
+    :return: A dictionary with the number of open widgets ('widgets'), of open form
+        containers ('form_boxes'), of live Form and Masonry objects ('forms',
+        'masonries') and of open widgets by class name ('by_type').
+    """
+    instances = getattr(widgets.widget, '_instances', None)
+    if instances is None:
+        instances = widgets.Widget.widgets
+    by_type = {}
+    form_boxes = 0
+    for wid in list(instances.values()):
+        name = type(wid).__name__
+        by_type[name] = by_type.get(name, 0) + 1
+        if 'ifk-form' in getattr(wid, '_dom_classes', ()):
+            form_boxes += 1
+    return {
+        'widgets': sum(by_type.values()),
+        'form_boxes': form_boxes,
+        'forms': len(_live_forms),
+        'masonries': len(_live_masonries),
+        'by_type': dict(sorted(by_type.items(), key=lambda item: -item[1])),
+    }
@@ -1,12 +1,55 @@
 import ipywidgets as widgets
+import traitlets
 import os
+from itertools import islice
+from functools import partial
+from .filesearch import DirectoryCache, match_entries, search_executor, get_path_index
+from .auxfuncs import call_later, threadsafe_scheduler
+
+# Directory listings shared by all FileAutocomplete widgets
+directory_cache = DirectoryCache()
+
+def close_widgets(widget):
+    """ Close a widget and recursively its children, layouts and styles. Widgets
+        that keep widgets outside of their children close them in their close method. """
+    stack = [widget]
+    seen = set()
+    while stack:
+        wid = stack.pop()
+        if id(wid) in seen:
+            continue
+        seen.add(id(wid))
+        stack.extend(getattr(wid, 'children', None) or ())
+        for name in ('layout', 'style'):
+            sub = getattr(wid, name, None)
+            if isinstance(sub, widgets.Widget):
+                stack.append(sub)
+        wid.close()
 
 class FileAutocomplete(widgets.VBox):
-    def __init__(self, root_path='./', placeholder='Start typing a file name...', max_results=10, **kwargs):
+    def __init__(self, root_path='./', placeholder='Start typing a file name...', max_results=10,
+                 match_mode='substring', cache=None, asynchronous=True, recursive=False,
+                 index_options=None, **kwargs):
         super().__init__()
         
         self.root_path = root_path
         self.max_results = max_results
+        # 'substring' or 'prefix'
+        self.match_mode = match_mode
+        self.cache = cache if cache is not None else directory_cache
+        # Search in a background thread, only the latest request is applied
+        self.asynchronous = asynchronous
+        self._request_id = 0
+        self._pending = None
+        self._clicking = False
+        # Optional profiling.Profiler, records the duration of lookups as 'file_lookup'
+        self.profiler = None
+        # Fuzzy search in all paths below root_path, see filesearch.PathIndex
+        self.recursive = recursive
+        self.index = None
+        if recursive:
+            self.index = get_path_index(root_path, **(index_options or {}))
+            self.index.start()
 
         # Main input field
         self.text = widgets.Text(placeholder=placeholder, **kwargs)
@@ -19,16 +62,56 @@ class FileAutocomplete(widgets.VBox):
         # Container for suggestions (styled like a dropdown)
         self.suggestions_box = widgets.VBox()
         self.suggestions_box.add_class('suggestion-box')
+        # Suggestion rows (at most max_results) and the row for messages, reused for all updates
+        self._pool = []
+        self._message = widgets.Label()
         self.children = [self.text, self.suggestions_box]
         self.text.observe(self._on_text_change, names='value')
         self.add_class('file-autocomplete')
     
     def _on_text_change(self, change):
-        typed = change['new']
-        matches = self._get_matching_files(typed)
-        self._update_suggestions(matches)
+        self._search(change['new'], clicked=self._clicking)
+
+    def _search(self, typed, clicked=False):
+        self._request_id += 1
+        request_id = self._request_id
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+
+        schedule = threadsafe_scheduler() if self.asynchronous else None
+        if schedule is None:
+            self._update_suggestions(self._get_matching_files(typed), clicked)
+            return
+
+        future = search_executor().submit(self._get_matching_files, typed)
+        self._pending = future
+        future.add_done_callback(lambda f: schedule(partial(self._on_search_done, request_id, f, clicked)))
+        # Only show the placeholder if the search is noticeably slow
+        call_later(0.1, partial(self._show_searching, request_id))
+
+    def _on_search_done(self, request_id, future, clicked):
+        # Drop results of outdated requests
+        if request_id != self._request_id or future.cancelled():
+            return
+        self._pending = None
+        self._update_suggestions(future.result(), clicked)
+
+    def _show_searching(self, request_id):
+        if request_id == self._request_id and self._pending is not None:
+            self._message.value = 'Searching\u2026'
+            self._set_suggestion_widgets([self._message])
     
     def _get_matching_files(self, path):
+        if self.profiler is not None:
+            with self.profiler.measure('file_lookup'):
+                return self._find_files(path)
+        return self._find_files(path)
+
+    def _find_files(self, path):
+        if self.index is not None:
+            return self.index.search(path, self.max_results)
+
         try:
             if os.sep in path:
                 folder = path[:path.rindex(os.sep)+1]
@@ -38,52 +121,42 @@ class FileAutocomplete(widgets.VBox):
                 prefix = path
 
             abs_folder_path = os.path.join(self.root_path, folder)
-            files = os.listdir(abs_folder_path)
-            matches = [folder + f for f in files if prefix in f]
-            return sorted(matches)[:self.max_results]
+            entries = self.cache.listing(abs_folder_path)
+            matches = match_entries(entries, prefix, self.max_results, self.match_mode)
+            return [(folder + name, is_dir) for name, is_dir in matches]
         except Exception:
             return []
 
     def _update_suggestions(self, matches, clicked=False):
+        # Rows are taken from a pool and only relabelled, no widgets are created per keystroke
         suggestion_widgets = []
         if not matches:
-            label = widgets.Label(value='No matches found')
-            suggestion_widgets.append(label)
+            self._message.value = 'No matches found'
+            suggestion_widgets.append(self._message)
         else:
             if clicked and len(matches)==1:
-                if matches[0] == self.text.value:
-                    self.suggestions_box.children = []
+                if matches[0][0] == self.text.value:
+                    self._set_suggestion_widgets([])
                     return
                 
-            for i, match in enumerate(matches):
-                abs_path = os.path.join(self.root_path, match)
-                is_dir = os.path.isdir(abs_path)
-                if i < len(self.suggestions_box.children) and hasattr(self.suggestions_box.children[0], 'children'):
-                    suggestion = self.suggestions_box.children[i]
-                    suggestion = self._reuse_suggestion(suggestion, match, is_dir)
-                else:
-                    suggestion = self._create_suggestion(match, is_dir)
-
+            for i, (match, is_dir) in enumerate(matches):
+                if i == len(self._pool):
+                    self._pool.append(self._create_suggestion())
+                suggestion = self._reuse_suggestion(self._pool[i], match, is_dir)
                 suggestion_widgets.append(suggestion)
 
-        self.suggestions_box.children = suggestion_widgets
+        self._set_suggestion_widgets(suggestion_widgets)
 
-    def _create_suggestion(self, match, is_dir):
-        icon_html = '\U0001F4C1' if is_dir else '\U0001F4C4'
-        icon_widget = widgets.Label(value=icon_html)
-        icon_widget.add_class('file-autocomplete-icon')
+    def _set_suggestion_widgets(self, suggestion_widgets):
+        if tuple(suggestion_widgets) != self.suggestions_box.children:
+            self.suggestions_box.children = suggestion_widgets
 
-        if os.sep in match:
-            description = match[match.rindex(os.sep)+1:]
-        else:
-            description = match
-
-        if is_dir:
-            description += os.sep
-            match += os.sep
+    def _create_suggestion(self):
+        icon_widget = widgets.Label()
+        icon_widget.add_class('file-autocomplete-icon')
 
-        text_button = widgets.Button(description=description)
-        text_button.file = match
+        text_button = widgets.Button()
+        text_button.file = None
         text_button.on_click(self._on_suggestion_clicked)
 
         suggestion = widgets.HBox(
@@ -105,15 +178,22 @@ class FileAutocomplete(widgets.VBox):
             description += os.sep
             match += os.sep
 
+        # Traits only send a message if their value actually changes
         suggestion.children[1].description = description
         suggestion.children[1].file = match
         suggestion.children[0].value = '\U0001F4C1' if is_dir else '\U0001F4C4'
         return suggestion
 
     def _on_suggestion_clicked(self, button):
-        matches = self._get_matching_files(button.file)
-        self.text.value = button.file
-        self._update_suggestions(matches, clicked=True)
+        if self.text.value == button.file:
+            self._search(button.file, clicked=True)
+            return
+
+        self._clicking = True
+        try:
+            self.text.value = button.file
+        finally:
+            self._clicking = False
 
     def observe(self, *args, **kwargs):
         if hasattr(self, 'text'):
@@ -123,17 +203,163 @@ class FileAutocomplete(widgets.VBox):
         # Otherwise, call the superclass observe method
         return super().observe(*args, **kwargs)
 
-    def __getattribute__(self, name):
-        if name == 'value':
-            return self.text.value
-        elif name == 'disabled':
-            return self.text.disabled
-        
-        return super().__getattribute__(name)
+    def unobserve(self, *args, **kwargs):
+        if hasattr(self, 'text'):
+            return self.text.unobserve(*args, **kwargs)
+        return super().unobserve(*args, **kwargs)
+
+    def refresh(self):
+        # Crawl the recursive index again, directory listings are checked by mtime
+        if self.index is not None:
+            self.index.refresh()
+
+    def close(self):
+        # Running searches are dropped, pooled rows outside of the children are closed
+        self._request_id = getattr(self, '_request_id', 0) + 1
+        if getattr(self, '_pending', None) is not None:
+            self._pending.cancel()
+        for suggestion in [*getattr(self, '_pool', ()), getattr(self, '_message', None)]:
+            if suggestion is not None:
+                close_widgets(suggestion)
+        super().close()
+
+    # value and disabled are the ones of the text field, so the widget can be set like a Text
+    @property
+    def value(self):
+        return self.text.value
+
+    @value.setter
+    def value(self, value):
+        self.text.value = value
+
+    @property
+    def disabled(self):
+        return self.text.disabled
+
+    @disabled.setter
+    def disabled(self, disabled):
+        self.text.disabled = disabled
     
+class SearchableDropdown(widgets.VBox):
+    """ Dropdown for very long option lists. The options stay in the kernel,
+        the frontend only receives the best max_results matches of the typed text. """
+    # Kernel side traits, so the widget can be used like a Dropdown (observe, value, disabled)
+    value = traitlets.Any(allow_none=True)
+    disabled = traitlets.Bool(False)
+
+    def __init__(self, options=(), value=None, placeholder='Type to search...', max_results=10, **kwargs):
+        super().__init__()
+
+        self.options = tuple(options)
+        self.max_results = max_results
+        self._labels = [str(option) for option in self.options]
+        self._lower = [label.lower() for label in self._labels]
+        try:
+            self._positions = {option: i for i, option in reversed(list(enumerate(self.options)))}
+        except TypeError:
+            # Unhashable options
+            self._positions = None
+
+        # Main input field
+        self.text = widgets.Text(placeholder=placeholder, **kwargs)
+        self.layout.width = '100%'
+        self.layout.overflow = 'visible'
+        self.text.layout.margin = '0px'
+        self.text.layout.width = '100%'
+
+        # Container for suggestions (styled like a dropdown), rows are pooled
+        self.suggestions_box = widgets.VBox()
+        self.suggestions_box.add_class('suggestion-box')
+        self._pool = []
+        self._message = widgets.Label(value='No matches found')
+        self.children = [self.text, self.suggestions_box]
+        self.add_class('file-autocomplete')
+        self.add_class('searchable-dropdown')
+
+        if value is None and self.options:
+            value = self.options[0]
+        self._updating = False
+        self.observe(self._on_value_change, names='value')
+        self.observe(self._on_disabled_change, names='disabled')
+        self.value = value
+        self.text.observe(self._on_text_change, names='value')
+
+    @traitlets.validate('value')
+    def _validate_value(self, proposal):
+        value = proposal['value']
+        if value is not None and self._position(value) is None:
+            raise traitlets.TraitError(f"Invalid selection: {value!r} is not an option.")
+        return value
+
+    def _position(self, value):
+        if self._positions is not None:
+            try:
+                return self._positions.get(value)
+            except TypeError:
+                return None
+        return self.options.index(value) if value in self.options else None
+
+    def _on_value_change(self, change):
+        position = self._position(change['new'])
+        self._updating = True
+        try:
+            self.text.value = self._labels[position] if position is not None else ''
+        finally:
+            self._updating = False
+        self._set_suggestion_widgets([])
+
+    def _on_disabled_change(self, change):
+        self.text.disabled = change['new']
+
+    def _on_text_change(self, change):
+        if self._updating:
+            return
+        pattern = change['new'].lower()
+        # Options keep their order, so the first matches are the top-k
+        matches = list(islice((i for i, label in enumerate(self._lower) if pattern in label), self.max_results))
+        self._update_suggestions(matches)
+
+    def _update_suggestions(self, matches):
+        if not matches:
+            self._set_suggestion_widgets([self._message])
+            return
+
+        suggestion_widgets = []
+        for i, position in enumerate(matches):
+            if i == len(self._pool):
+                button = widgets.Button()
+                button.add_class('autocomplete-suggestions')
+                button.on_click(self._on_suggestion_clicked)
+                self._pool.append(button)
+            button = self._pool[i]
+            button.description = self._labels[position]
+            button.position = position
+            suggestion_widgets.append(button)
+        self._set_suggestion_widgets(suggestion_widgets)
+
+    def _set_suggestion_widgets(self, suggestion_widgets):
+        if tuple(suggestion_widgets) != self.suggestions_box.children:
+            self.suggestions_box.children = suggestion_widgets
+
+    def _on_suggestion_clicked(self, button):
+        value = self.options[button.position]
+        if self.value == value:
+            self._on_value_change({'new': value})
+        else:
+            self.value = value
+
+    def close(self):
+        # Pooled rows outside of the children
+        for suggestion in [*getattr(self, '_pool', ()), getattr(self, '_message', None)]:
+            if suggestion is not None:
+                close_widgets(suggestion)
+        super().close()
+
 class CollapsibleVBox(widgets.VBox):
-    def __init__(self, children=None, title='Section', collapsed=False):
+    def __init__(self, children=None, title='Section', collapsed=False, builder=None):
         self.collapsed = collapsed
+        # Callable returning the children, called on the first expand
+        self.builder = builder
         
         # Collapse/expand button (not toggle)
         self.toggle_button = widgets.Button(
@@ -162,5 +388,16 @@ class CollapsibleVBox(widgets.VBox):
 
     def _on_toggle_click(self, b):
         self.collapsed = not self.collapsed
+        if not self.collapsed:
+            self.materialize()
         self.content_box.layout.display = 'none' if self.collapsed else 'block'
         self.toggle_button.description = '\u25B6' if self.collapsed else '\u25BC'
+
+    def materialize(self):
+        if self.builder is not None:
+            builder, self.builder = self.builder, None
+            self.content_box.children = builder()
+
+    def close(self):
+        self.builder = None
+        super().close()
@@ -0,0 +1,251 @@
+import os
+import re
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from itertools import islice, takewhile, compress
+from time import monotonic
+
+
+#=====================================================================
+class DirectoryCache(object):
+    """ Cache of directory listings, invalidated when the modification time
+        of a directory changes and optionally after ttl seconds.
+        At most max_entries directories are kept (least recently used first out). """
+    def __init__(self, ttl=None, max_entries=128):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._listings = OrderedDict()
+        # Listings are read from the search threads
+        self._lock = threading.Lock()
+
+    def listing(self, path):
+        """ Return the entries of a directory as a sorted list of
+            (name, is_dir) tuples. Errors of os.stat/os.scandir are raised. """
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._listings.get(path)
+            if cached is not None:
+                cached_mtime, time_of_listing, entries = cached
+                expired = self.ttl is not None and monotonic() - time_of_listing > self.ttl
+                if cached_mtime == mtime and not expired:
+                    self._listings.move_to_end(path)
+                    return entries
+
+        entries = scan_directory(path)
+        with self._lock:
+            self._listings[path] = (mtime, monotonic(), entries)
+            self._listings.move_to_end(path)
+            while self.max_entries is not None and len(self._listings) > self.max_entries:
+                self._listings.popitem(last=False)
+        return entries
+
+    def invalidate(self, path=None):
+        """ Drop the listing of path, or all listings if path is None. """
+        with self._lock:
+            if path is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(os.path.abspath(path), None)
+
+#=====================================================================
+_executor = None
+
+def search_executor():
+    """ Return the thread pool shared by all background file searches. """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ifk-search')
+    return _executor
+
+#=====================================================================
+def scan_directory(path):
+    """ List a directory with os.scandir, using the entry types reported by the
+        file system instead of one stat call per entry.
+        :return: A list of (name, is_dir) tuples sorted by name. """
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            entries.append((entry.name, is_dir))
+    entries.sort()
+    return entries
+
+#=====================================================================
+def match_entries(entries, pattern, max_results, mode='substring'):
+    """ Select the first max_results entries (in name order) matching pattern.
+        :param entries: A list of (name, is_dir) tuples sorted by name.
+        :param pattern: The string to match.
+        :param max_results: The maximum number of matches.
+        :param mode: 'substring' matches pattern anywhere in the name, 'prefix'
+            only at the start of the name, using a binary search on the sorted entries.
+        :return: A list of (name, is_dir) tuples. """
+    if mode == 'prefix':
+        start = bisect_left(entries, (pattern,))
+        matches = takewhile(lambda entry: entry[0].startswith(pattern), islice(entries, start, None))
+        return list(islice(matches, max_results))
+    elif mode == 'substring':
+        # Entries are sorted, so the first matches are the top-k, no full sort needed
+        return list(islice((entry for entry in entries if pattern in entry[0]), max_results))
+    raise ValueError(f"mode must be 'substring' or 'prefix', got {mode!r}")
+
+#=====================================================================
+DEFAULT_IGNORE = ('.git', '.hg', '.svn', 'node_modules', '__pycache__', '.ipynb_checkpoints', '.venv', 'venv')
+
+class PathIndex(object):
+    """ In-memory index of all paths below root, filled incrementally by a
+        background crawler (breadth first) until one of the budgets is spent.
+        Searches work on whatever has been indexed so far. The index is crawled
+        again by the first search after ttl seconds (None: never) or by refresh,
+        the old paths stay searchable until the new crawl finished. """
+    def __init__(self, root, max_depth=8, max_files=200000, time_budget=10.0, ignore=DEFAULT_IGNORE, ttl=300.0):
+        self.root = os.path.abspath(root)
+        self.max_depth = max_depth
+        self.max_files = max_files
+        self.time_budget = time_budget
+        self.ignore = frozenset(ignore)
+        self.ttl = ttl
+        # Relative paths (folders end with os.sep), their lower case version and
+        # lower case file names. Only appended to by the crawler, paths last.
+        self.paths = []
+        self._lower = []
+        self._names = []
+        self.complete = False
+        # monotonic() time when the last crawl ended
+        self.crawled_at = None
+        self._last_search = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """ Start the crawler thread, if it is not running yet and the index
+            was not crawled yet or is older than ttl seconds. """
+        expired = (self.ttl is not None and self.crawled_at is not None
+                   and monotonic() - self.crawled_at > self.ttl)
+        if self._thread is None or expired:
+            self.refresh()
+
+    def refresh(self):
+        """ Crawl root again, e.g. after files were created. Does nothing while a crawl runs. """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._crawl, args=(self._thread is not None,),
+                                            name='ifk-crawler', daemon=True)
+            self._thread.start()
+
+    def _crawl(self, replace=False):
+        # The first crawl fills the index in place, later ones replace it when done
+        if replace:
+            paths, lower, names = [], [], []
+        else:
+            paths, lower, names = self.paths, self._lower, self._names
+        complete = self._walk(paths, lower, names)
+        with self._lock:
+            if replace:
+                self.paths, self._lower, self._names = paths, lower, names
+                self._last_search = None
+            self.complete = complete
+            self.crawled_at = monotonic()
+
+    def _walk(self, paths, lower, names):
+        deadline = monotonic() + self.time_budget if self.time_budget is not None else None
+        queue = deque([('', 0)])
+        while queue:
+            folder, depth = queue.popleft()
+            try:
+                entries = scan_directory(os.path.join(self.root, folder))
+            except OSError:
+                continue
+            for name, is_dir in entries:
+                if name in self.ignore:
+                    continue
+                path = folder + name + (os.sep if is_dir else '')
+                names.append(name.lower())
+                lower.append(path.lower())
+                paths.append(path)
+                if is_dir and depth + 1 < self.max_depth:
+                    queue.append((path, depth + 1))
+                if self.max_files is not None and len(paths) >= self.max_files:
+                    return False
+            if deadline is not None and monotonic() > deadline:
+                return False
+        return True
+
+    def search(self, pattern, max_results):
+        """ Fuzzy search: all characters of pattern have to appear in the path
+            in the same order (case-insensitive).
+            :return: The max_results best matches as (path, is_dir) tuples. """
+        if not pattern:
+            return []
+        self.start()
+        with self._lock:
+            paths, lower, names, last = self.paths, self._lower, self._names, self._last_search
+        count = len(paths)
+        pattern = pattern.lower()
+        # Greedy negated classes match a subsequence without backtracking
+        regex = re.compile(''.join(f'[^{re.escape(c)}]*{re.escape(c)}' for c in pattern))
+
+        if last is not None and pattern.startswith(last[0]):
+            # The pattern extends the last one, only its matches have to be searched again
+            last_pattern, last_count, last_matches = last
+            candidates = last_matches + list(range(last_count, count))
+            matches = list(compress(candidates, map(regex.match, (lower[i] for i in candidates))))
+        else:
+            matches = list(compress(range(count), map(regex.match, lower[:count])))
+        with self._lock:
+            if lower is self._lower:
+                self._last_search = (pattern, count, matches)
+
+        # Cheap ranking of all matches, the best ones are scored in detail
+        ranked = heapq.nlargest(4 * max_results, matches, key=lambda i: (
+            pattern in names[i], names[i].startswith(pattern), pattern in lower[i], -len(lower[i])))
+        best = sorted(ranked, key=lambda i: -fuzzy_score(pattern, paths[i]))[:max_results]
+        out = []
+        for i in best:
+            path = paths[i]
+            is_dir = path.endswith(os.sep)
+            out.append((path[:-1] if is_dir else path, is_dir))
+        return out
+
+#=====================================================================
+def fuzzy_score(pattern, path):
+    """ Score a path matching pattern as a subsequence. Consecutive characters,
+        matches at the start of a path component and short paths score higher. """
+    pattern = pattern.lower()
+    lower = path.lower()
+    score = 0
+    position = 0
+    previous = -2
+    for char in pattern:
+        index = lower.find(char, position)
+        if index < 0:
+            return float('-inf')
+        if index == previous + 1:
+            score += 5
+        if index == 0 or path[index-1] in (os.sep, '_', '-', '.', ' '):
+            score += 3
+        previous = index
+        position = index + 1
+    # Prefer matches in the file name over matches in the folders
+    if lower.rstrip(os.sep).rfind(os.sep) < previous:
+        score += 2
+    return score - 0.01 * len(path)
+
+#=====================================================================
+_path_indexes = {}
+
+def get_path_index(root, **kwargs):
+    """ Return the PathIndex shared by all widgets searching root with the same options. """
+    options = {name: tuple(sorted(value)) if isinstance(value, (list, set, frozenset)) else value
+               for name, value in kwargs.items()}
+    key = (os.path.abspath(root), tuple(sorted(options.items())))
+    if key not in _path_indexes:
+        _path_indexes[key] = PathIndex(root, **kwargs)
+    return _path_indexes[key]
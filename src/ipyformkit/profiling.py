@@ -0,0 +1,168 @@
+"""
+Opt-in instrumentation of the reactive update pipeline of forms.
+"""
+import threading
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+import ipywidgets as widgets
+
+# Profilers with a change event in progress, counting comm messages
+_active = []
+_active_lock = threading.Lock()
+# Widget._send while the counter is installed
+_original_send = None
+
+
+#=====================================================================
+def _counting_send(self, msg, buffers=None):
+    for profiler in _active:
+        profiler._messages += 1
+    return _original_send(self, msg, buffers)
+
+def _activate(profiler):
+    """ Count the messages of all widgets for profiler. Widget._send is only
+        wrapped while at least one profiled event is in progress. """
+    global _original_send
+    with _active_lock:
+        if not _active and _original_send is None:
+            _original_send = widgets.Widget._send
+            widgets.Widget._send = _counting_send
+        _active.append(profiler)
+
+def _deactivate(profiler):
+    global _original_send
+    with _active_lock:
+        _active.remove(profiler)
+        # Left in place if something else wrapped Widget._send in the meantime
+        if not _active and widgets.Widget.__dict__.get('_send') is _counting_send:
+            widgets.Widget._send = _original_send
+            _original_send = None
+
+#=====================================================================
+class Stats(object):
+    """ Call count, total and recent samples of one measured quantity. """
+    def __init__(self, max_samples):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def summary(self):
+        samples = sorted(self.samples)
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p95': samples[min(len(samples) - 1, int(0.95 * len(samples)))] if samples else 0.0,
+            'max': samples[-1] if samples else 0.0,
+        }
+
+#=====================================================================
+class Profiler(object):
+    def __init__(self, hooks=None, max_samples=10000):
+        """
+        Collects timings of conditions, value reads, change events and file lookups.
+
+        Parameters
+        ----------
+        hooks : list of callable, optional
+            Functions called as hook(name, value, unit) for every measurement, e.g. to
+            export to a metrics system. unit is 's' for durations and 'messages' for
+            the number of comm messages of a change event. Hooks of file lookups are
+            called from the search thread. Default is None.
+        max_samples : int, optional
+            The number of most recent samples kept per name for percentiles. Default is 10000.
+        """
+        self.hooks = list(hooks or [])
+        self.max_samples = max_samples
+        self.timings = {}
+        self.messages = {}
+        self._messages = 0
+        self._lock = threading.Lock()
+
+    #=====================================================================
+    def record(self, name, value, unit='s'):
+        """
+        Add a measurement.
+        :param name: The name of the measured quantity, e.g. 'check:age'.
+        :param value: The duration in seconds, or the number of messages.
+        :param unit: 's' or 'messages'.
+        """
+        target = self.timings if unit == 's' else self.messages
+        with self._lock:
+            if name not in target:
+                target[name] = Stats(self.max_samples)
+            target[name].add(value)
+        for hook in self.hooks:
+            hook(name, value, unit)
+
+    #=====================================================================
+    @contextmanager
+    def measure(self, name):
+        """
+        Context manager recording the duration of its block.
+        :param name: The name of the measured quantity.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - start)
+
+    #=====================================================================
+    @contextmanager
+    def event(self, name):
+        """
+        Context manager for a change event: records its duration and the
+        number of comm messages sent by any widget while it runs.
+        :param name: The name of the event, e.g. 'change:age'.
+        """
+        messages = self._messages
+        _activate(self)
+        try:
+            with self.measure(name):
+                yield
+        finally:
+            _deactivate(self)
+            self.record(name, self._messages - messages, unit='messages')
+
+    #=====================================================================
+    def reset(self):
+        """
+        Forget all measurements.
+        """
+        with self._lock:
+            self.timings.clear()
+            self.messages.clear()
+
+    #=====================================================================
+    def report(self):
+        """
+        :return: A dictionary {'timings': {name: stats}, 'messages': {name: stats}} where stats
+            is a dictionary with count, total, mean, p95 and max (seconds or messages).
+        """
+        with self._lock:
+            return {
+                'timings': {name: stats.summary() for name, stats in self.timings.items()},
+                'messages': {name: stats.summary() for name, stats in self.messages.items()},
+            }
+
+    #=====================================================================
+    def table(self):
+        """
+        :return: The report as a text table, slowest entries first.
+        """
+        report = self.report()
+        lines = [f"{'name':<40} {'count':>7} {'total ms':>10} {'mean ms':>9} {'p95 ms':>9} {'msgs/event':>10}"]
+        rows = sorted(report['timings'].items(), key=lambda item: -item[1]['total'])
+        for name, stats in rows:
+            messages = report['messages'].get(name)
+            messages = f"{messages['mean']:.1f}" if messages else ''
+            lines.append(f"{str(name)[:40]:<40} {stats['count']:>7} {stats['total']*1000:>10.2f} "
+                         f"{stats['mean']*1000:>9.3f} {stats['p95']*1000:>9.3f} {messages:>10}")
+        return '\n'.join(lines)
@@ -0,0 +1,308 @@
+"""
+Edit many records of a columnar store with a single form.
+"""
+import ipywidgets as widgets
+from IPython.display import display
+from .core import Form, load_stylesheets
+from .custom_widgets import close_widgets
+from .spec import iter_fields, NO_VALUE
+from .state import convert_value
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+#=====================================================================
+class ColumnStore(object):
+    """ Row access to a dict of equally long lists or arrays, or a pandas
+        DataFrame (by position). Values are written back in place. NumPy arrays
+        whose dtype cannot hold a value (e.g. a longer string in a <U3 array, or
+        a float in an int array) are replaced by a widened copy in the dict. """
+    def __init__(self, data):
+        self.data = data
+        # pandas is only detected, never imported
+        self._frame = hasattr(data, 'iat') and hasattr(data, 'columns')
+        if self._frame:
+            self.keys = [str(key) for key in data.columns]
+            self._positions = {str(key): i for i, key in enumerate(data.columns)}
+            self.length = len(data)
+        else:
+            self.keys = list(data)
+            lengths = {len(column) for column in data.values()}
+            if len(lengths) > 1:
+                raise ValueError(f"All columns must have the same length. Got {sorted(lengths)}.")
+            self.length = lengths.pop() if lengths else 0
+
+    def __len__(self):
+        return self.length
+
+    def get(self, key, row):
+        value = self.data.iat[row, self._positions[key]] if self._frame else self.data[key][row]
+        # NumPy scalars to Python values, as expected by the widgets
+        item = getattr(value, 'item', None)
+        return item() if callable(item) else value
+
+    def set(self, key, row, value):
+        if self._frame:
+            # pandas upcasts the column itself
+            self.data.iat[row, self._positions[key]] = value
+            return
+        column = self.data[key]
+        dtype = getattr(column, 'dtype', None)
+        if dtype is not None and dtype != object and not self._fits(value, dtype):
+            try:
+                dtype = np.result_type(column, np.asarray(value))
+            except TypeError:
+                dtype = object
+            column = self.data[key] = column.astype(dtype)
+        column[row] = value
+
+    @staticmethod
+    def _fits(value, dtype):
+        # Assigning to an array silently truncates strings and floats
+        try:
+            return bool(np.asarray(value, dtype=dtype) == value)
+        except (TypeError, ValueError):
+            return False
+
+    def column(self, key):
+        """ The column as an array (without a copy where possible) if NumPy is available. """
+        column = self.data[key] if not self._frame else self.data[self.data.columns[self._positions[key]]]
+        if np is None:
+            return column
+        return column.to_numpy() if hasattr(column, 'to_numpy') else np.asarray(column)
+
+#=====================================================================
+class RecordEditor(object):
+    def __init__(self, input_dict, records, **kwargs):
+        """
+        One form for many records: a navigator switches the record shown in the form,
+        edits are written back to the columns of the store.
+
+        Parameters
+        ----------
+        input_dict : dict
+            The form dictionary, see Form.
+        records : dict or pandas.DataFrame
+            The records as columns: a dictionary of equally long lists or NumPy arrays,
+            or a DataFrame. Columns are matched to fields by key, other fields keep their
+            values when switching records.
+        **kwargs
+            Passed to Form, e.g. mandatory, disable, hide and check. All widgets are
+            created at once, lazy and deferred are ignored.
+
+        Attributes
+        ----------
+        form : Form
+            The form showing the current record.
+        store : ColumnStore
+            Row access to the records.
+        index : int
+            The index of the current record.
+        box : ipywidgets.VBox
+            The navigator and the form.
+        unfit : list of str
+            The keys of the current record whose value does not fit the field (e.g. None
+            in a text column). The form shows the field default and marks them.
+        """
+        kwargs.update(lazy=False, deferred=False)
+        self.form = Form(input_dict, **kwargs)
+        self.store = ColumnStore(records)
+        self._fields = {field.key: field for field in iter_fields(self.form._spec)}
+        self.keys = [key for key in self.store.keys if key in self._fields and self._fields[key].default is not NO_VALUE]
+        self.index = 0
+        self.unfit = []
+        self._loading = False
+        self._invalid = None
+
+        self._prev_button = widgets.Button(description='◀', layout=widgets.Layout(width='40px'))
+        self._next_button = widgets.Button(description='▶', layout=widgets.Layout(width='40px'))
+        self._index_text = widgets.BoundedIntText(value=1, min=1, max=max(len(self.store), 1),
+                                                  layout=widgets.Layout(width='90px'))
+        self._count_label = widgets.Label(f"of {len(self.store)}")
+        self._invalid_button = widgets.Button(description='Next invalid')
+        self._invalid_label = widgets.Label()
+        self._unfit_label = widgets.Label()
+        self._prev_button.on_click(lambda b: self.show(self.index - 1))
+        self._next_button.on_click(lambda b: self.show(self.index + 1))
+        self._index_text.observe(self._on_index_change, names='value')
+        self._invalid_button.on_click(lambda b: self.show_next_invalid())
+        navigator = widgets.HBox([self._prev_button, self._index_text, self._count_label, self._next_button,
+                                  self._invalid_button, self._invalid_label, self._unfit_label])
+        navigator.layout.align_items = 'center'
+        self.box = widgets.VBox([navigator, self.form.vbox])
+        # The open widgets keep the editor alive, like a Form
+        self.box.editor = self
+
+        self.form.add_observer(self._on_edit, self.keys)
+        if len(self.store):
+            self.show(0)
+
+    #=====================================================================
+    def record(self, index):
+        """
+        :param index: The record index.
+        :return: The values of the record as a dictionary.
+        """
+        return {key: self.store.get(key, index) for key in self.keys}
+
+    #=====================================================================
+    def show(self, index):
+        """
+        Show a record in the form. Only the widgets whose value differs are updated,
+        and the conditions are evaluated once. Values that do not fit their field are
+        shown as the field default and listed in unfit.
+        :param index: The record index, clipped to the valid range.
+        """
+        if not len(self.store):
+            return
+        index = min(max(index, 0), len(self.store) - 1)
+        changed = {}
+        unfit = []
+        for key, value in self.record(index).items():
+            field = self._fields[key]
+            value = convert_value(field, value)
+            if value is NO_VALUE:
+                unfit.append(key)
+                value = field.default
+            if self.form.values.get(key, NO_VALUE) != value:
+                changed[key] = value
+
+        self.index = index
+        self.unfit = unfit
+        # Neither the value observers nor the index field may react to the loading
+        self._loading = True
+        try:
+            self.form.set_values(changed, verbose=False)
+            for key in self.keys:
+                wid = self.form.widgets_dict[key].wid
+                if (key in unfit) != ('ifk-widget-input-missing' in wid._dom_classes):
+                    if key in unfit:
+                        wid.add_class('ifk-widget-input-missing')
+                    else:
+                        wid.remove_class('ifk-widget-input-missing')
+
+            with self.box.hold_sync():
+                self._unfit_label.value = f"Invalid values: {', '.join(unfit)}" if unfit else ''
+                self._index_text.value = index + 1
+                self._prev_button.disabled = index == 0
+                self._next_button.disabled = index == len(self.store) - 1
+        finally:
+            self._loading = False
+
+    def _on_index_change(self, change):
+        if not self._loading:
+            self.show(change['new'] - 1)
+
+    #=====================================================================
+    def _on_edit(self, key, change):
+        # Write edits of the user back to the store, in place
+        if not self._loading:
+            self.store.set(key, self.index, change['new'])
+            self._invalid = None
+
+    #=====================================================================
+    def invalid_rows(self, vectorized=True):
+        """
+        Validate all records with the rules of the form, like check_and_return_values.
+        Records with values that do not fit their field are invalid as well.
+        :param vectorized: If True and NumPy is available, each condition is first called
+            once with the whole columns as arrays (e.g. d['age'] > 0). Conditions that
+            raise or do not return one boolean per record are evaluated record by record.
+        :return: A sorted list of the indices of invalid records.
+        """
+        if vectorized and np is not None:
+            invalid = self._invalid_vectorized()
+        else:
+            results = self.form.rules.validate_many(self._merged(i) for i in range(len(self.store)))
+            invalid = [i for i, result in enumerate(results) if not result.valid]
+        invalid = sorted(set(invalid).union(self._unfit_rows()))
+        self._invalid = invalid
+        self._invalid_label.value = f"{len(invalid)} invalid" if invalid else ''
+        return invalid
+
+    def _unfit_rows(self):
+        return [i for i in range(len(self.store))
+                if any(convert_value(self._fields[key], self.store.get(key, i)) is NO_VALUE for key in self.keys)]
+
+    def _merged(self, index):
+        # Values of fields without a column are the ones in the form
+        values = dict(self.form.values)
+        values.update(self.record(index))
+        return values
+
+    #=====================================================================
+    def _invalid_vectorized(self):
+        rules = self.form.rules
+        n = len(self.store)
+        columns = {key: np.full(n, value, dtype=object) if not isinstance(value, (bool, int, float)) else np.full(n, value)
+                   for key, value in self.form.values.items()}
+        for key in self.keys:
+            columns[key] = self.store.column(key)
+        errors = np.zeros(n, dtype=bool)
+
+        def evaluate(kind, key):
+            condition = rules.conditions[kind][key]
+            try:
+                result = np.asarray(condition(columns))
+                if result.shape == (n,):
+                    return result.astype(bool)
+            except Exception:
+                pass
+            # Record by record, failing conditions make the record invalid
+            out = np.zeros(n, dtype=bool)
+            for i in range(n):
+                try:
+                    out[i] = bool(condition(self._merged(i)))
+                except Exception:
+                    errors[i] = True
+            return out
+
+        inactive = {}
+        for kind in ('disable', 'hide'):
+            for key in rules.conditions[kind]:
+                inactive[key] = inactive.get(key, np.zeros(n, dtype=bool)) | evaluate(kind, key)
+
+        invalid = errors
+        for key in rules.conditions['check']:
+            active = ~inactive.get(key, np.zeros(n, dtype=bool))
+            passed = evaluate('check', key)
+            invalid |= ~passed & (active | rules.validate_inactive)
+        for key in rules.mandatory:
+            if key in columns:
+                active = ~inactive.get(key, np.zeros(n, dtype=bool))
+                empty = np.array([value == '' for value in columns[key]], dtype=bool)
+                invalid |= empty & (active | rules.validate_inactive)
+        return np.flatnonzero(invalid).tolist()
+
+    #=====================================================================
+    def show_next_invalid(self):
+        """
+        Show the next invalid record after the current one (wrapping around).
+        :return: The index of the record, or None if all records are valid.
+        """
+        invalid = self._invalid if self._invalid is not None else self.invalid_rows()
+        if not invalid:
+            return None
+        index = next((i for i in invalid if i > self.index), invalid[0])
+        self.show(index)
+        return index
+
+    #=====================================================================
+    def display(self):
+        """
+        Display the navigator and the form in the notebook.
+        """
+        items = [self.box, *load_stylesheets()]
+        display(*items)
+
+    #=====================================================================
+    def close(self):
+        """
+        Close the form and the navigator, see Form.close. The records are not touched.
+        """
+        self.form.close()
+        close_widgets(self.box)
+        self.box.editor = None
@@ -0,0 +1,152 @@
+"""
+Record value changes of a live form and replay them headlessly, e.g. to load-test
+the observer pipeline without a browser.
+"""
+import json
+from time import perf_counter, sleep
+from .auxfuncs import WeakCallback
+from .profiling import Profiler, Stats
+
+
+#=====================================================================
+class EventRecorder(object):
+    def __init__(self, form):
+        """
+        Records the value changes of the widgets of a form with timestamps.
+
+        Parameters
+        ----------
+        form : Form
+            The form to record. Widgets of lazy sections are recorded if they
+            exist when start is called.
+
+        Attributes
+        ----------
+        events : list of dict
+            {'t': seconds since start, 'key': field key, 'value': new value}.
+        """
+        self.form = form
+        self.events = []
+        self._observers = []
+        self._start = None
+
+    #=====================================================================
+    def start(self):
+        """
+        Start recording, events recorded before are kept.
+        """
+        if self._observers:
+            return
+        if self._start is None:
+            self._start = perf_counter()
+        for key, entry in self.form.widgets_dict.items():
+            if hasattr(entry.wid, 'value'):
+                callback = WeakCallback(self._record, key)
+                entry.wid.observe(callback, names='value')
+                self._observers.append((entry.wid, callback))
+
+    #=====================================================================
+    def stop(self):
+        """
+        Stop recording.
+        """
+        for wid, callback in self._observers:
+            wid.unobserve(callback, names='value')
+        self._observers.clear()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    #=====================================================================
+    def _record(self, key, change):
+        self.events.append({'t': perf_counter() - self._start, 'key': key, 'value': change['new']})
+
+    #=====================================================================
+    def save(self, path):
+        """
+        Save the recorded events as JSON.
+        :param path: The file path.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.events, f)
+
+    #=====================================================================
+    @staticmethod
+    def load(path):
+        """
+        Load events saved with save.
+        :param path: The file path.
+        :return: A list of events for replay.
+        """
+        with open(path) as f:
+            return json.load(f)
+
+#=====================================================================
+def _apply_event(form, key, value):
+    entry = form.widgets_dict.get(key)
+    if entry is None:
+        # Field of a section that is not built yet
+        form.set_values({key: value}, verbose=False, batch=False)
+    else:
+        entry.wid.value = value
+
+#=====================================================================
+def replay_events(form, events, speed=None, flush=True):
+    """
+    Drive recorded events into a form and measure each one.
+    :param form: The form, e.g. a fresh instance of the recorded form.
+    :param events: Events as recorded by EventRecorder (a list of dictionaries with
+        't', 'key' and 'value').
+    :param speed: None to replay at maximum speed, 1.0 at the recorded speed, 2.0
+        twice as fast etc. Default is None.
+    :param flush: If True, delayed condition updates (update_policy 'debounce' or
+        'throttle') are flushed after each event and included in its latency.
+        Default is True.
+    :return: A dictionary with 'events', a list with the key, latency in seconds,
+        number of condition evaluations and of comm messages of every event, and
+        'summary' with their count, total, mean, p95 and max latency and the total
+        evaluations and messages. FileAutocomplete searches that run in the
+        background are not included in the latency.
+    """
+    profiler = Profiler()
+    previous, form.rules.profiler = form.rules.profiler, profiler
+
+    def evaluations():
+        return sum(stats.count for name, stats in profiler.timings.items() if name != 'event')
+
+    results = []
+    start = perf_counter()
+    try:
+        for event in events:
+            if speed:
+                delay = event['t'] / speed - (perf_counter() - start)
+                if delay > 0:
+                    sleep(delay)
+
+            evaluated = evaluations()
+            messages = profiler.messages['event'].total if 'event' in profiler.messages else 0
+            event_start = perf_counter()
+            with profiler.event('event'):
+                _apply_event(form, event['key'], event['value'])
+                if flush:
+                    form.flush()
+            results.append({
+                'key': event['key'],
+                'latency': perf_counter() - event_start,
+                'evaluations': evaluations() - evaluated,
+                'messages': int(profiler.messages['event'].total - messages),
+            })
+    finally:
+        form.rules.profiler = previous
+
+    latencies = Stats(max(len(results), 1))
+    for result in results:
+        latencies.add(result['latency'])
+    summary = latencies.summary()
+    summary['evaluations'] = sum(result['evaluations'] for result in results)
+    summary['messages'] = sum(result['messages'] for result in results)
+    return {'events': results, 'summary': summary}
@@ -0,0 +1,294 @@
+"""
+Widget-free rule engine for the mandatory, disable, hide and check rules of a Form.
+"""
+import os
+from collections import deque, namedtuple
+from itertools import islice
+from .auxfuncs import TrackingDict, DependencyGraph
+
+KINDS = ('check', 'disable', 'hide')
+_MISSING = object()
+
+
+#=====================================================================
+class ValidationResult(namedtuple('ValidationResult', ['values', 'errors', 'states'])):
+    """
+    Result of RuleSet.validate.
+
+    Attributes
+    ----------
+    values : dict
+        The values of all fields that are neither disabled nor hidden.
+    errors : list of tuple
+        (key, reason, message) for every failed rule. reason is 'mandatory',
+        'check' or 'error' (a condition raised an exception).
+    states : dict
+        The evaluated condition results, {key: {kind: bool}}.
+    """
+    __slots__ = ()
+
+    @property
+    def valid(self):
+        return not self.errors
+
+    @property
+    def missing(self):
+        return [key for key, reason, message in self.errors if reason == 'mandatory']
+
+#=====================================================================
+class RuleSet(object):
+    def __init__(self, mandatory=None, disable=None, hide=None, check=None, depends_on=None, keys=None,
+                 validate_inactive=False, cache_checks=True):
+        """
+        The rules of a form, evaluated on plain value dictionaries.
+
+        Parameters
+        ----------
+        mandatory : list of str, optional
+            A list of keys that must not be empty. Default is None.
+        disable, hide, check : dict, optional
+            Dictionaries where keys are field names and values are functions that
+            take the values of the form and return a boolean, see Form. Default is None.
+        depends_on : dict, optional
+            A dictionary where keys are field names and values are lists of field names
+            that the conditions of this field read. Conditions of fields without an
+            entry are traced automatically on every evaluation. Default is None.
+        keys : collection, optional
+            The valid field keys. Conditions for other keys are ignored. Default is None (all).
+        validate_inactive : bool, optional
+            If True, validate also disabled and hidden fields, although they are not part
+            of the returned values. Default is False.
+        cache_checks : bool, optional
+            If True, the result of a check is reused as long as the values it read are
+            unchanged. Set to False for checks that depend on external state. Default is True.
+
+        Attributes
+        ----------
+        conditions : dict
+            {kind: {key: function}} for the kinds 'check', 'disable' and 'hide'.
+        dependencies : DependencyGraph
+            The value keys each (kind, key) condition reads.
+        profiler : Profiler or None
+            If set, the duration of every condition evaluation is recorded as 'kind:key'.
+        """
+        self.mandatory = list(mandatory) if isinstance(mandatory, (list, tuple, set)) else []
+
+        self.depends_on = {}
+        if isinstance(depends_on, dict):
+            self.depends_on = {key: frozenset(deps) for key, deps in depends_on.items()}
+        elif depends_on:
+            print(f"Warning: depends_on should be a dictionary. Got {type(depends_on).__name__} instead.")
+
+        self.validate_inactive = validate_inactive
+        self.cache_checks = cache_checks
+        # {(kind, key): (dependency keys, their values, result)}
+        self._cache = {}
+        self.profiler = None
+
+        self.dependencies = DependencyGraph()
+        self.conditions = {}
+        for kind, conditions in (('check', check), ('disable', disable), ('hide', hide)):
+            self.conditions[kind] = self._add_conditions(conditions, kind, keys)
+
+    #=====================================================================
+    def _add_conditions(self, conditions, kind, keys):
+        conditions_out = {}
+        if isinstance(conditions, dict):
+            for key, val in conditions.items():
+                if keys is None or key in keys:
+                    if callable(val):
+                        conditions_out[key] = val
+                        # Declared dependencies are fixed, all others are traced on evaluation
+                        self.dependencies.set((kind, key), self.depends_on.get(key))
+        elif conditions:
+            print(f"Warning: Conditions should be a dictionary. Got {type(conditions).__name__} instead.")
+
+        return conditions_out
+
+    #=====================================================================
+    def nodes(self, keys=None):
+        """
+        :param keys: Only return the conditions of these keys. Default is all.
+        :return: A list of (kind, key) pairs of all conditions.
+        """
+        return [(kind, key) for kind in KINDS for key in self.conditions[kind]
+                if keys is None or key in keys]
+
+    #=====================================================================
+    def affected(self, keys, wildcard=True):
+        """
+        :param keys: Changed value keys.
+        :param wildcard: If False, conditions that read all values (e.g. by iterating
+            over them) are only included if they read one of the keys explicitly.
+        :return: The set of (kind, key) conditions that have to be re-evaluated.
+        """
+        affected = set()
+        for key in keys:
+            affected |= self.dependencies.affected(key, wildcard)
+        return affected
+
+    #=====================================================================
+    def evaluate(self, kind, key, values, trace=True):
+        """
+        Evaluate a condition and record the keys it reads, unless they were declared.
+        :param kind: The kind of the condition (disable, hide or check).
+        :param key: The field key the condition belongs to.
+        :param values: The current values of the form.
+        :param trace: If False, neither the dependencies nor the check cache are updated,
+            e.g. for values that are not the live values of the form. Default is True.
+        :return: The result of the condition as a boolean.
+        """
+        node = (kind, key)
+        cached = kind == 'check' and self.cache_checks
+        if cached and node in self._cache:
+            keys, key_values, result = self._cache[node]
+            if tuple(values.get(k, _MISSING) for k in keys) == key_values:
+                return result
+
+        condition = self.conditions[kind][key]
+        if self.profiler is not None:
+            with self.profiler.measure(f'{kind}:{key}'):
+                return self._evaluate(node, condition, values, cached, trace)
+        return self._evaluate(node, condition, values, cached, trace)
+
+    #=====================================================================
+    def _evaluate(self, node, condition, values, cached, trace):
+        kind, key = node
+        if not trace:
+            return bool(condition(values))
+        if key in self.depends_on:
+            result = bool(condition(values))
+        else:
+            tracker = TrackingDict(values)
+            try:
+                result = bool(condition(tracker))
+            finally:
+                self.dependencies.set(node, None if tracker.accessed_all else tracker.accessed)
+
+        keys = self.dependencies.get(node)
+        if cached and keys is not None:
+            keys = tuple(keys)
+            self._cache[node] = (keys, tuple(values.get(k, _MISSING) for k in keys), result)
+        return result
+
+    #=====================================================================
+    def clear_cache(self):
+        """
+        Forget all cached check results.
+        """
+        self._cache.clear()
+
+    #=====================================================================
+    def evaluate_states(self, values, nodes=None, errors=None, trace=True):
+        """
+        Evaluate several conditions.
+        :param values: The current values of the form.
+        :param nodes: Iterable of (kind, key) pairs to evaluate. Default is all conditions.
+        :param errors: Optional list, (kind, key, exception) is appended for failing conditions.
+        :param trace: If False, dependencies and cached checks are not updated, see evaluate.
+        :return: A dictionary {key: {kind: bool}}.
+        """
+        states = {}
+        for kind, key in self.nodes() if nodes is None else nodes:
+            if key not in self.conditions[kind]:
+                continue
+            try:
+                states.setdefault(key, {})[kind] = self.evaluate(kind, key, values, trace)
+            except Exception as e:
+                if errors is None:
+                    raise
+                errors.append((kind, key, e))
+        return states
+
+    #=====================================================================
+    def validate(self, values, states=None, kinds=KINDS):
+        """
+        Validate one set of values like Form.check_and_return_values. The dependencies
+        and cached checks of the rules are only read, so validating arbitrary values does
+        not change the updates of a live form using the rules.
+        :param values: A dictionary of field values.
+        :param states: Optional {key: {kind: bool}} that replace evaluated states,
+            e.g. the actual disable/hide state of widgets.
+        :param kinds: The kinds of conditions to evaluate. Default is all.
+        :return: A ValidationResult.
+        """
+        failed = []
+        nodes = [(kind, key) for kind, key in self.nodes() if kind in kinds and kind != 'check']
+        evaluated = self.evaluate_states(values, nodes, errors=failed, trace=False)
+        for key, state in (states or {}).items():
+            evaluated.setdefault(key, {}).update(state)
+
+        def active(key):
+            state = evaluated.get(key, {})
+            return not (state.get('disable', False) or state.get('hide', False))
+
+        # Checks last, so inactive fields can be skipped
+        if 'check' in kinds:
+            nodes = [('check', key) for key in self.conditions['check']
+                     if self.validate_inactive or active(key)]
+            for key, state in self.evaluate_states(values, nodes, errors=failed, trace=False).items():
+                evaluated.setdefault(key, {}).update(state)
+
+        errors = [(key, 'error', f"Error evaluating {kind} condition of '{key}'.\n{type(e).__name__}:{e}")
+                  for kind, key, e in failed]
+        out = {}
+        for key, value in values.items():
+            state = evaluated.get(key, {})
+            is_active = active(key)
+            if is_active or self.validate_inactive:
+                if value == '' and key in self.mandatory:
+                    errors.append((key, 'mandatory', f"Mandatory field '{key}' is empty."))
+                if not state.get('check', True):
+                    errors.append((key, 'check', f"Invalid input in field '{key}'."))
+            if is_active:
+                out[key] = value
+
+        return ValidationResult(out, errors, evaluated)
+
+    #=====================================================================
+    def validate_many(self, values_iter, processes=None, chunksize=64, start_method=None):
+        """
+        Validate a stream of value dictionaries.
+        :param values_iter: An iterable of value dictionaries, consumed lazily.
+        :param processes: If given, validate in a process pool with this many workers
+            (0 for os.cpu_count()). Useful for CPU-heavy checks. The rules are sent to the
+            workers, so with the 'spawn' and 'forkserver' start methods all condition
+            functions have to be picklable (no lambdas).
+        :param chunksize: Number of value dictionaries sent to a worker at once.
+        :param start_method: The multiprocessing start method of the workers. Default is
+            None, the default of the platform. 'fork' avoids pickling the rules, but can
+            deadlock in processes with running threads, e.g. a Jupyter kernel.
+        :return: A generator of ValidationResult, in input order.
+        """
+        if processes is None:
+            for values in values_iter:
+                yield self.validate(values)
+            return
+
+        # Only imported for process pools, to keep the import of this module fast
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        context = multiprocessing.get_context(start_method)
+        workers = processes or os.cpu_count() or 1
+        values_iter = iter(values_iter)
+        chunks = iter(lambda: list(islice(values_iter, chunksize)), [])
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(self,)) as executor:
+            # Bounded number of chunks in flight, so streams are not read ahead completely
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(executor.submit(_validate_chunk, chunk))
+                if len(in_flight) >= 2 * workers:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
+
+#=====================================================================
+_worker_rules = None
+
+def _init_worker(rules):
+    global _worker_rules
+    _worker_rules = rules
+
+def _validate_chunk(chunk):
+    return [_worker_rules.validate(values) for values in chunk]
@@ -0,0 +1,138 @@
+"""
+Widget-free parsing of form dictionaries into a compiled form spec.
+"""
+import os
+from collections import namedtuple
+from .auxfuncs import count_decimal_places
+
+# Tuples with more options are shown as a SearchableDropdown
+MAX_DROPDOWN_OPTIONS = 1000
+
+# Marks fields whose widget has no value (e.g. buttons)
+NO_VALUE = object()
+
+
+#=====================================================================
+class Field(namedtuple('Field', ['key', 'kind', 'value', 'default', 'params'])):
+    """
+    A single input field of a compiled form.
+
+    Attributes
+    ----------
+    key : str
+        The field name.
+    kind : str
+        The field kind, selects the widget factory (e.g. 'text', 'int', 'dropdown').
+    value : object
+        The value from the form dictionary.
+    default : object
+        The initial value of the widget, or NO_VALUE for widgets without a value.
+    params : dict
+        Kind specific parameters, e.g. the placeholder or the step.
+    """
+    __slots__ = ()
+
+#=====================================================================
+class Section(namedtuple('Section', ['title', 'rows'])):
+    """
+    A nested, collapsible group of rows of a compiled form.
+    """
+    __slots__ = ()
+
+#=====================================================================
+def classify_none(key, value):
+    return Field(key, 'button', value, NO_VALUE, {})
+
+def classify_bool(key, value):
+    return Field(key, 'checkbox', value, value, {})
+
+def classify_int(key, value):
+    return Field(key, 'int', value, value, {})
+
+def classify_float(key, value):
+    return Field(key, 'float', value, value, {'step': 10**(-count_decimal_places(value))})
+
+def classify_str(key, value):
+    if os.sep in value:
+        return Field(key, 'file', value, '', {'placeholder': value})
+    elif 'password' in key.lower():
+        return Field(key, 'password', value, '', {'placeholder': value})
+    elif value.endswith('...'):
+        return Field(key, 'textarea', value, '', {'placeholder': value[:-3]})
+    else:
+        return Field(key, 'text', value, '', {'placeholder': value})
+
+def classify_tuple(key, value):
+    if len(value) > MAX_DROPDOWN_OPTIONS:
+        # Only the matches of the typed text are sent to the frontend
+        return Field(key, 'searchable', value, value[0], {})
+    elif value:
+        return Field(key, 'dropdown', value, value[0], {})
+    else:
+        return Field(key, 'label', value, "(Empty list - no options)", {})
+
+# Checked in order with isinstance, bool has to come before int
+FIELD_TYPES = [
+    (type(None), classify_none),
+    (bool, classify_bool),
+    (int, classify_int),
+    (float, classify_float),
+    (str, classify_str),
+    (tuple, classify_tuple),
+]
+
+#=====================================================================
+def register_field_type(value_type, classify):
+    """
+    Register how values of a type are turned into fields. Registered types
+    take precedence over the built-in ones.
+    :param value_type: The type (or tuple of types) of the values in the form dictionary.
+    :param classify: A function (key, value) -> Field.
+    """
+    FIELD_TYPES.insert(0, (value_type, classify))
+
+#=====================================================================
+def classify(key, value):
+    """
+    Create the Field for one entry of a form dictionary.
+    :param key: The field name.
+    :param value: The value from the form dictionary.
+    :return: A Field.
+    """
+    for value_type, classify_value in FIELD_TYPES:
+        if isinstance(value, value_type):
+            return classify_value(key, value)
+    return Field(key, 'label', value, f"Unsupported type: {type(value).__name__}", {})
+
+#=====================================================================
+def compile_spec(input_dict):
+    """
+    Parse a form dictionary into rows of Field and Section items.
+    :param input_dict: A dictionary as passed to Form.
+    :return: A tuple of rows, each row a tuple of Field and Section items.
+    """
+    rows = []
+    for key, value in input_dict.items():
+        if isinstance(key, tuple) and isinstance(value, tuple):
+            # Case: nested tuple group
+            rows.append(tuple(classify(sub_key, sub_val) for sub_key, sub_val in zip(key, value)))
+        elif isinstance(value, dict):
+            # Case: nested dictionary group
+            rows.append((Section(key, compile_spec(value)),))
+        else:
+            rows.append((classify(key, value),))
+    return tuple(rows)
+
+#=====================================================================
+def iter_fields(rows):
+    """
+    Iterate over all fields of compiled rows, including nested sections.
+    :param rows: Rows as returned by compile_spec.
+    :return: A generator of Field.
+    """
+    for row in rows:
+        for item in row:
+            if isinstance(item, Section):
+                yield from iter_fields(item.rows)
+            else:
+                yield item
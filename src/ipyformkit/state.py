@@ -0,0 +1,171 @@
+"""
+Widget-free serialization of form values, tagged with a hash of the form spec.
+"""
+import hashlib
+import json
+import os
+from .spec import iter_fields, NO_VALUE
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+STATE_VERSION = 1
+MSGPACK_EXTENSIONS = ('.msgpack', '.mpk')
+# {kind: (encode, decode)} for values json and msgpack can not store, see register_value_codec
+VALUE_CODECS = {}
+
+
+#=====================================================================
+def schema_hash(rows):
+    """
+    A short hash of the keys, kinds and dictionary values of all fields, e.g. the
+    options of dropdowns. It changes whenever saved values might not fit anymore.
+    :param rows: Rows as returned by spec.compile_spec.
+    :return: A hex string.
+    """
+    digest = hashlib.sha256()
+    for field in iter_fields(rows):
+        digest.update(repr((field.key, field.kind, field.value)).encode())
+    return digest.hexdigest()[:16]
+
+#=====================================================================
+def register_value_codec(kind, encode, decode):
+    """
+    Register how the values of a field kind are stored in states, e.g. for custom
+    kinds added with register_field_kind whose values json can not store.
+    :param kind: The field kind.
+    :param encode: A function value -> serializable value.
+    :param decode: A function serializable value -> value, the inverse of encode.
+    """
+    VALUE_CODECS[kind] = (encode, decode)
+
+#=====================================================================
+def make_state(rows, values):
+    """
+    :param rows: Rows as returned by spec.compile_spec.
+    :param values: The values of the form.
+    :return: A serializable dictionary with the values, their field kinds and the schema hash.
+        Values of kinds with a registered codec are encoded.
+    """
+    kinds = {field.key: field.kind for field in iter_fields(rows) if field.key in values}
+    encoded = {}
+    for key, value in values.items():
+        codec = VALUE_CODECS.get(kinds.get(key))
+        encoded[key] = codec[0](value) if codec is not None else value
+    return {
+        'version': STATE_VERSION,
+        'schema': schema_hash(rows),
+        'kinds': kinds,
+        'values': encoded,
+    }
+
+#=====================================================================
+def decode_values(state):
+    """
+    :param state: A dictionary as returned by make_state.
+    :return: The values of the state, decoded with the codecs of their saved kinds.
+    """
+    kinds = state.get('kinds', {})
+    out = {}
+    for key, value in state.get('values', {}).items():
+        codec = VALUE_CODECS.get(kinds.get(key))
+        out[key] = codec[1](value) if codec is not None else value
+    return out
+
+#=====================================================================
+def _format(path, format):
+    if format is None:
+        format = 'msgpack' if str(path).endswith(MSGPACK_EXTENSIONS) else 'json'
+    if format not in ('json', 'msgpack'):
+        raise ValueError(f"Unknown state format '{format}'. Use 'json' or 'msgpack'.")
+    if format == 'msgpack' and msgpack is None:
+        raise ImportError("The msgpack format requires the msgpack package.")
+    return format
+
+#=====================================================================
+def _unserializable(value):
+    raise TypeError(f"Values of type {type(value).__name__} can not be saved. "
+                    f"Register a codec for their field kind with register_value_codec.")
+
+#=====================================================================
+def write_state(path, state, format=None):
+    """
+    Write a state to a file. The file is replaced atomically.
+    :param path: The file path.
+    :param state: A dictionary as returned by make_state, or any serializable dictionary.
+    :param format: 'json' or 'msgpack'. Default is msgpack for .msgpack/.mpk files, else json.
+    """
+    format = _format(path, format)
+    if format == 'msgpack':
+        data = msgpack.packb(state, use_bin_type=True, default=_unserializable)
+    else:
+        data = json.dumps(state, separators=(',', ':'), default=_unserializable).encode()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+#=====================================================================
+def read_state(path, format=None):
+    """
+    Read a state written by write_state.
+    :param path: The file path.
+    :param format: 'json' or 'msgpack'. Default is chosen by the file extension.
+    :return: The state dictionary.
+    """
+    format = _format(path, format)
+    with open(path, 'rb') as f:
+        data = f.read()
+    if format == 'msgpack':
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+#=====================================================================
+def convert_value(field, value):
+    """
+    Convert a saved value to the current field, e.g. after the field changed from int to float.
+    :param field: The current Field.
+    :param value: The saved value.
+    :return: The converted value, or NO_VALUE if it does not fit the field.
+    """
+    if field.default is NO_VALUE:
+        return NO_VALUE
+    if field.kind in ('dropdown', 'searchable'):
+        return value if value in field.value else NO_VALUE
+    if type(value) == type(field.default):
+        return value
+    if isinstance(field.default, float) and type(value) == int:
+        return float(value)
+    if type(field.default) == int and isinstance(value, float) and value.is_integer():
+        return int(value)
+    return NO_VALUE
+
+#=====================================================================
+def migrate_values(state, rows, verbose=True):
+    """
+    Match the values of a state saved for a different schema to the current fields.
+    :param state: A dictionary as returned by make_state.
+    :param rows: The current rows as returned by spec.compile_spec.
+    :param verbose: If True, print a warning for every value that can not be restored.
+    :return: A dictionary of the values that fit the current fields.
+    """
+    fields = {field.key: field for field in iter_fields(rows)}
+    kinds = state.get('kinds', {})
+    out = {}
+    for key, value in decode_values(state).items():
+        field = fields.get(key)
+        if field is None:
+            if verbose:
+                print(f"Warning: Saved field '{key}' does not exist in the form anymore. Skipped.")
+            continue
+
+        converted = convert_value(field, value)
+        if converted is not NO_VALUE:
+            out[key] = converted
+        elif verbose and field.default is not NO_VALUE:
+            print(f"Warning: Saved value of '{key}' ({kinds.get(key, 'unknown')}: {value!r}) "
+                  f"does not fit the field ({field.kind}). Skipped.")
+    return out
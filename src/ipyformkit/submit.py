@@ -0,0 +1,273 @@
+"""
+Non-blocking submit buttons: validate, then run a job in the background.
+"""
+import inspect
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import partial
+import ipywidgets as widgets
+from .auxfuncs import threadsafe_scheduler
+
+
+#=====================================================================
+class SubmitAction(object):
+    def __init__(self, validate, func, executor='thread', label='Submit', max_pending=0,
+                 coalesce=False, on_done=None):
+        """
+        A submit button that validates the input and hands the values to func in the
+        background, so the widgets stay responsive while the job runs.
+
+        Parameters
+        ----------
+        validate : callable
+            Returns the values to submit, or None if the input is invalid
+            (e.g. Form.check_and_return_values).
+        func : callable
+            The job, called as func(values). If it has a 'progress' parameter, it gets a
+            function progress(fraction, message=None) that updates the progress bar. If it
+            has a 'cancelled' parameter, it gets a threading.Event that is set by cancel().
+            Both can be called from any thread, neither is passed to process executors.
+        executor : str or concurrent.futures.Executor, optional
+            'thread' (one background thread), 'process' (one worker process, func and
+            values must be picklable), 'asyncio' (func is a coroutine function, run as a
+            task on the kernel's event loop) or an Executor, which is not shut down by
+            close. Default is 'thread'.
+        label : str, optional
+            The description of the button. Default is 'Submit'.
+        max_pending : int, optional
+            The number of submissions queued while a job runs. With 0 the button is
+            disabled while a job runs. Further submissions are rejected. Default is 0.
+        coalesce : bool, optional
+            If True and the queue is full, the last queued submission is replaced by the
+            new one instead of rejecting it. Default is False.
+        on_done : callable, optional
+            Called as on_done(result) on the kernel thread after a job succeeded. Default is None.
+
+        Attributes
+        ----------
+        box : ipywidgets.HBox
+            The button, progress bar, cancel button and status text.
+        result, exception :
+            The result or exception of the last finished job.
+        """
+        self.validate = validate
+        self.func = func
+        self.max_pending = max_pending
+        self.coalesce = coalesce
+        self.on_done = on_done
+        self.result = None
+        self.exception = None
+
+        # Reentrant, done callbacks of finished futures run inside submit
+        self._lock = threading.RLock()
+        self._queue = deque()
+        self._running = None
+        self._running_values = None
+        self._cancelled = None
+        self._progress_value = None
+        self._schedule = None
+
+        self._owns_executor = not isinstance(executor, Executor)
+        self._mode = 'executor'
+        if isinstance(executor, Executor):
+            self.executor = executor
+        elif executor == 'thread':
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ifk-submit')
+        elif executor == 'process':
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=1)
+            self._mode = 'process'
+        elif executor == 'asyncio':
+            self.executor = None
+            self._mode = 'asyncio'
+        else:
+            raise ValueError(f"Unknown executor '{executor}'. Use 'thread', 'process', 'asyncio' or an Executor.")
+
+        parameters = inspect.signature(func).parameters
+        self._pass_progress = 'progress' in parameters and self._mode != 'process'
+        self._pass_cancelled = 'cancelled' in parameters and self._mode != 'process'
+
+        self.button = widgets.Button(description=label, button_style='primary')
+        self.button.on_click(lambda b: self.submit())
+        self.cancel_button = widgets.Button(description='Cancel', layout=widgets.Layout(display='none'))
+        self.cancel_button.on_click(lambda b: self.cancel())
+        self.progress = widgets.FloatProgress(min=0.0, max=1.0, layout=widgets.Layout(display='none'))
+        self.status = widgets.Label()
+        self.box = widgets.HBox([self.button, self.progress, self.cancel_button, self.status])
+        self.box.add_class('ifk-form-hbox')
+
+    #=====================================================================
+    @property
+    def busy(self):
+        """
+        True while a job runs.
+        """
+        return self._running is not None
+
+    #=====================================================================
+    @property
+    def pending(self):
+        """
+        The number of queued submissions.
+        """
+        return len(self._queue)
+
+    #=====================================================================
+    def submit(self):
+        """
+        Validate and submit the current values, like a click on the button.
+        :return: True if the values were started or queued, False otherwise.
+        """
+        values = self.validate()
+        if values is None:
+            self.status.value = 'Invalid input, not submitted.'
+            return False
+
+        with self._lock:
+            if self._running is None:
+                self._start(values)
+                return True
+            if values == self._running_values or values in self._queue:
+                self.status.value = 'Already submitted.'
+                return False
+            if len(self._queue) < self.max_pending:
+                self._queue.append(values)
+            elif self.coalesce and self._queue:
+                self._queue[-1] = values
+            else:
+                self.status.value = 'Busy, submission ignored.'
+                return False
+        self._update_widgets()
+        return True
+
+    #=====================================================================
+    def _start(self, values):
+        # Called with the lock held, on the kernel thread
+        self._schedule = threadsafe_scheduler()
+        self._cancelled = threading.Event()
+        self._running_values = values
+        kwargs = {}
+        if self._pass_progress:
+            kwargs['progress'] = self._on_progress
+        if self._pass_cancelled:
+            kwargs['cancelled'] = self._cancelled
+
+        if self._mode == 'asyncio':
+            import asyncio
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is None:
+                # No kernel loop (e.g. a script), run to completion
+                future = Future()
+                try:
+                    future.set_result(asyncio.run(self.func(values, **kwargs)))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                future = loop.create_task(self.func(values, **kwargs))
+        else:
+            future = self.executor.submit(self.func, values, **kwargs)
+
+        self._running = future
+        self._update_widgets(status='Running…')
+        future.add_done_callback(self._on_future_done)
+
+    #=====================================================================
+    def _call_on_kernel(self, callback):
+        if self._schedule is not None:
+            self._schedule(callback)
+        else:
+            callback()
+
+    def _on_future_done(self, future):
+        self._call_on_kernel(partial(self._finish, future))
+
+    #=====================================================================
+    def _finish(self, future):
+        status = 'Done.'
+        try:
+            if future.cancelled() or self._cancelled.is_set():
+                status = 'Cancelled.'
+            elif future.exception() is not None:
+                self.exception = future.exception()
+                status = f"Failed: {type(self.exception).__name__}: {self.exception}"
+            else:
+                self.result = future.result()
+                self.exception = None
+                if self.on_done is not None:
+                    try:
+                        self.on_done(self.result)
+                    except Exception as e:
+                        print(f"Error in on_done of {self.button.description}\n{type(e).__name__}:{e}")
+                        status = f"Done, on_done failed: {type(e).__name__}: {e}"
+        finally:
+            # The next submission can start whatever happened above, errors still propagate
+            with self._lock:
+                self._running = None
+                self._running_values = None
+                next_values = self._queue.popleft() if self._queue else None
+                if next_values is not None:
+                    self._start(next_values)
+            if next_values is None:
+                self._update_widgets(status=status)
+
+    #=====================================================================
+    def _on_progress(self, fraction, message=None):
+        # Called from the job, only the latest value is applied on the kernel thread
+        with self._lock:
+            scheduled = self._progress_value is not None
+            self._progress_value = (fraction, message)
+        if not scheduled:
+            self._call_on_kernel(self._apply_progress)
+
+    def _apply_progress(self):
+        with self._lock:
+            fraction, message = self._progress_value
+            self._progress_value = None
+        self.progress.value = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.status.value = str(message)
+
+    #=====================================================================
+    def cancel(self):
+        """
+        Drop all queued submissions and cancel the running job. Jobs that already
+        started in an executor stop only if they check their 'cancelled' event.
+        """
+        with self._lock:
+            self._queue.clear()
+            running = self._running
+        if running is not None:
+            self._cancelled.set()
+            # Before cancel, which finishes the job synchronously if it did not start
+            self._update_widgets(status='Cancelling…')
+            running.cancel()
+
+    #=====================================================================
+    def _update_widgets(self, status=None):
+        busy = self._running is not None
+        with self.box.hold_sync():
+            self.button.disabled = busy and self.max_pending == 0
+            self.cancel_button.layout.display = None if busy else 'none'
+            self.progress.layout.display = None if busy and self._pass_progress else 'none'
+            if busy and status is not None:
+                self.progress.value = 0.0
+            if status is not None:
+                self.status.value = status
+            elif self._queue:
+                self.status.value = f"Running… ({len(self._queue)} queued)"
+
+    #=====================================================================
+    def close(self):
+        """
+        Cancel all jobs, shut down an executor created by the action and close its widgets.
+        """
+        self.cancel()
+        if self._owns_executor and self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.box.close()
+        for wid in (self.button, self.progress, self.cancel_button, self.status):
+            wid.close()
@@ -0,0 +1,47 @@
+import asyncio
+from ipyformkit.auxfuncs import Debouncer
+
+
+def test_debouncer_without_loop_calls_immediately():
+    calls = []
+    debouncer = Debouncer(calls.append, 10.0)
+    assert debouncer(1) is None
+    assert calls == [1]
+    assert not debouncer.pending
+
+
+def test_debounce_runs_last_call_once():
+    calls = []
+
+    async def main():
+        debouncer = Debouncer(calls.append, 0.05)
+        for i in range(3):
+            debouncer(i)
+        assert calls == [] and debouncer.pending
+        await asyncio.sleep(0.2)
+        assert calls == [2]
+        debouncer(3)
+        assert debouncer.flush() is None
+        assert calls == [2, 3]
+        await asyncio.sleep(0.1)
+        assert calls == [2, 3]
+
+    asyncio.run(main())
+
+
+def test_throttle_runs_at_most_once_per_wait():
+    calls = []
+
+    async def main():
+        debouncer = Debouncer(calls.append, 0.1, mode='throttle')
+        debouncer(0)
+        await asyncio.sleep(0.01)
+        assert calls == [0]
+        debouncer(1)
+        debouncer(2)
+        await asyncio.sleep(0.02)
+        assert calls == [0]
+        await asyncio.sleep(0.2)
+        assert calls == [0, 2]
+
+    asyncio.run(main())
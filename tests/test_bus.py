@@ -0,0 +1,44 @@
+import pytest
+from ipyformkit.bus import ValueBus
+
+
+class Listener(object):
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, keys):
+        self.calls.append(keys)
+
+
+def test_views_and_publish():
+    bus = ValueBus()
+    settings, plot = {'units': 'mm'}, {'width': 1.0}
+    settings_listener, plot_listener = Listener(), Listener()
+    settings_view = bus.join('settings', settings, settings_listener)
+    plot_view = bus.join('plot', plot, plot_listener)
+
+    assert plot_view['width'] == 1.0
+    assert plot_view['settings.units'] == 'mm'
+    assert 'settings.units' in plot_view
+    assert 'settings.missing' not in plot_view
+    assert plot_view.get('other.units') is None
+    assert list(plot_view) == ['width']
+
+    settings['units'] = 'in'
+    assert plot_view['settings.units'] == 'in'
+    bus.publish('settings', ['units'])
+    assert plot_listener.calls == [{'settings.units'}]
+    assert settings_listener.calls == []
+
+    bus.leave('settings')
+    assert 'settings.units' not in plot_view
+    assert settings_view['units'] == 'in'
+
+
+def test_invalid_namespaces():
+    bus = ValueBus()
+    bus.join('a', {}, Listener())
+    with pytest.raises(ValueError):
+        bus.join('a', {}, Listener())
+    with pytest.raises(ValueError):
+        bus.join('a.b', {}, Listener())
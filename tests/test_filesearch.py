@@ -0,0 +1,39 @@
+import os
+import pytest
+from ipyformkit.filesearch import DirectoryCache, match_entries
+
+
+def test_directory_cache_is_invalidated_by_mtime(tmp_path):
+    (tmp_path / 'b.txt').touch()
+    (tmp_path / 'a').mkdir()
+    cache = DirectoryCache()
+    entries = cache.listing(tmp_path)
+    assert entries == [('a', True), ('b.txt', False)]
+    assert cache.listing(tmp_path) is entries
+
+    (tmp_path / 'c.txt').touch()
+    stat = os.stat(tmp_path)
+    os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.listing(tmp_path) == [('a', True), ('b.txt', False), ('c.txt', False)]
+
+    cache.invalidate()
+    assert cache.listing(tmp_path) is not entries
+
+
+def test_directory_cache_max_entries(tmp_path):
+    for name in 'abc':
+        (tmp_path / name).mkdir()
+    cache = DirectoryCache(max_entries=2)
+    for name in 'abc':
+        cache.listing(tmp_path / name)
+    assert list(cache._listings) == [str(tmp_path / 'b'), str(tmp_path / 'c')]
+
+
+def test_match_entries():
+    entries = sorted((name, False) for name in ['data.csv', 'data2.csv', 'notes.txt', 'old_data.csv'])
+    assert match_entries(entries, 'data', 2) == [('data.csv', False), ('data2.csv', False)]
+    assert match_entries(entries, 'data', 10, mode='prefix') == [('data.csv', False), ('data2.csv', False)]
+    assert match_entries(entries, 'data', 10) == [('data.csv', False), ('data2.csv', False), ('old_data.csv', False)]
+    assert match_entries(entries, 'x', 10, mode='prefix') == []
+    with pytest.raises(ValueError):
+        match_entries(entries, 'data', 10, mode='fuzzy')
@@ -0,0 +1,242 @@
+import pytest
+
+pytest.importorskip('ipywidgets')
+import ipyformkit as ifk
+
+
+def test_masonry_shared_values_initial_states(capsys):
+    a = ifk.Form({'x': 1}, title='A', disable={'x': lambda d: d['B.y'] > 5})
+    b = ifk.Form({'y': 10}, title='B')
+    ifk.Masonry([a, b], shared_values=True)
+    assert capsys.readouterr().out == ''
+    assert a.widgets_dict['x'].wid.disabled
+    assert a.check_and_return_values() == {}
+    b.widgets_dict['y'].wid.value = 1
+    assert not a.widgets_dict['x'].wid.disabled
+
+
+def test_form_with_namespace_is_evaluated_without_bus():
+    form = ifk.Form({'z': 1, 'w': 0}, namespace='C', disable={'z': lambda d: d['w'] == 0})
+    assert form.widgets_dict['z'].wid.disabled
+
+
+def test_keys_of_other_forms_without_bus(capsys):
+    form = ifk.Form({'x': 1}, title='A', disable={'x': lambda d: d['B.yy'] > 5})
+    assert capsys.readouterr().out == ''
+    form.display()
+    assert 'Warning: B.yy is not a valid key in the form.' in capsys.readouterr().out
+
+    b = ifk.Form({'y': 10}, title='B')
+    ifk.Masonry([form, b], shared_values=True)
+    assert "Error updating disable state for x\nKeyError:'B.yy'" in capsys.readouterr().out
+    form.display()
+    assert 'Warning' not in capsys.readouterr().out
+
+
+def test_validation_keeps_live_dependencies():
+    form = ifk.Form({'a': 0, 'b': 0, 'c': 1}, disable={'c': lambda d: d['a'] > 0 or d['b'] > 0})
+    list(form.rules.validate_many([{'a': 5, 'b': 0, 'c': 1}]))
+    form.widgets_dict['b'].wid.value = 3
+    assert form.widgets_dict['c'].wid.disabled
+
+
+def test_record_editor():
+    columns = {'a': [0, 0, 5], 'b': [0, 0, 0], 'c': [1, 1, 1], 'name': ['Ann', None, 'Cy']}
+    editor = ifk.RecordEditor({'a': 0, 'b': 0, 'c': 1, 'name': ''}, columns,
+                              disable={'c': lambda d: d['a'] > 0 or d['b'] > 0})
+    assert editor.invalid_rows(vectorized=False) == [1]
+    # Batch validation does not break the live conditions
+    editor.form.widgets_dict['b'].wid.value = 3
+    assert editor.form.widgets_dict['c'].wid.disabled
+    assert columns['b'] == [3, 0, 0]
+
+    editor.show(2)
+    editor.show(1)
+    assert editor.form.values['name'] == ''
+    assert editor.unfit == ['name']
+    assert columns['name'][1] is None
+
+
+def test_disable_condition_on_label_field():
+    form = ifk.Form({'a': 1, 'e': ()}, disable={'e': lambda d: d['a'] > 0})
+    assert 'ifk-widget-input-disabled' in form.widgets_dict['e'].wid._dom_classes
+    assert 'e' not in form.check_and_return_values()
+    form.widgets_dict['a'].wid.value = 0
+    assert 'ifk-widget-input-disabled' not in form.widgets_dict['e'].wid._dom_classes
+
+
+def test_state_of_file_field(tmp_path):
+    input_dict = {'a': 1, 'path': str(tmp_path) + '/'}
+    form = ifk.Form(input_dict, disable={'path': lambda d: d['a'] > 1})
+    assert isinstance(form.widgets_dict['path'].wid, ifk.FileAutocomplete)
+    form.widgets_dict['path'].wid.value = str(tmp_path / 'data.csv')
+    form.widgets_dict['a'].wid.value = 2
+    assert form.widgets_dict['path'].wid.text.disabled
+    form.save_state(tmp_path / 'state.json')
+
+    other = ifk.Form(input_dict, disable={'path': lambda d: d['a'] > 1})
+    other.load_state(tmp_path / 'state.json')
+    assert other.widgets_dict['path'].wid.text.value == str(tmp_path / 'data.csv')
+    assert other.values['path'] == str(tmp_path / 'data.csv')
+    assert other.widgets_dict['path'].wid.disabled
+
+
+def test_lazy_section_gets_values_set_before_it_is_built(tmp_path):
+    input_dict = {'a': 1, 'Files': {'path': str(tmp_path) + '/', 'n': 2}}
+    form = ifk.Form(input_dict, lazy=True, disable={'n': lambda d: d['a'] > 1})
+    assert 'path' not in form.widgets_dict
+    form.set_values({'a': 2, 'path': str(tmp_path / 'data.csv'), 'n': 3})
+    section = form.vbox.children[1].children[0]
+    assert isinstance(section, ifk.CollapsibleVBox)
+    section.materialize()
+    assert form.widgets_dict['path'].wid.text.value == str(tmp_path / 'data.csv')
+    assert form.widgets_dict['n'].wid.value == 3
+    assert form.widgets_dict['n'].wid.disabled
+
+
+def test_record_editor_shows_a_record_once():
+    editor = ifk.RecordEditor({'a': 0}, {'a': [1, 2, 3]})
+    calls = []
+    show = editor.show
+    editor.show = lambda index: (calls.append(index), show(index))
+    editor._next_button.click()
+    assert calls == [1]
+    assert editor._index_text.value == 2
+    editor._index_text.value = 3
+    assert calls == [1, 2]
+    assert editor.form.values['a'] == 3
+
+
+def test_record_editor_vectorized():
+    np = pytest.importorskip('numpy')
+    columns = {'a': np.array([0, 0, 5]), 'b': np.array([0, 0, 0]), 'name': np.array(['Ann', '', 'Cy'])}
+    input_dict = {'a': 0, 'b': 0, 'name': ''}
+    # int() of an array raises, so the check of b is evaluated record by record
+    check = {'a': lambda d: d['a'] < 5, 'b': lambda d: int(d['b']) == 0}
+    editor = ifk.RecordEditor(input_dict, columns, mandatory=['name'], check=check)
+    assert editor.invalid_rows(vectorized=True) == [1, 2]
+    assert editor.invalid_rows(vectorized=False) == [1, 2]
+
+    # Edits do not get truncated by the dtype of the arrays
+    editor.form.widgets_dict['name'].wid.value = 'Annabelle'
+    assert columns['name'][0] == 'Annabelle'
+    store = ifk.records.ColumnStore({'x': np.array([1, 2])})
+    store.set('x', 0, 2.5)
+    assert store.get('x', 0) == 2.5
+
+
+def test_debounced_conditions():
+    import asyncio
+
+    async def main():
+        form = ifk.Form({'a': 0, 'b': 1}, disable={'b': lambda d: d['a'] > 0},
+                        update_policy='debounce', wait_ms=30)
+        form.widgets_dict['a'].wid.value = 1
+        assert not form.widgets_dict['b'].wid.disabled
+        await asyncio.sleep(0.15)
+        assert form.widgets_dict['b'].wid.disabled
+        form.widgets_dict['a'].wid.value = 0
+        form.flush()
+        assert not form.widgets_dict['b'].wid.disabled
+
+    asyncio.run(main())
+
+
+def test_batch_evaluates_conditions_once():
+    calls = []
+
+    def total_too_high(d):
+        calls.append(1)
+        return d['a'] + d['b'] + d['c'] > 5
+
+    form = ifk.Form({'a': 0, 'b': 0, 'c': 0, 'd': 1}, disable={'d': total_too_high})
+    calls.clear()
+    with form.batch():
+        with form.batch():
+            form.widgets_dict['a'].wid.value = 2
+        form.widgets_dict['b'].wid.value = 2
+        form.widgets_dict['c'].wid.value = 2
+        assert calls == []
+        assert not form.widgets_dict['d'].wid.disabled
+    assert len(calls) == 1
+    assert form.widgets_dict['d'].wid.disabled
+
+    calls.clear()
+    form.set_values({'a': 0, 'b': 0})
+    assert len(calls) == 1
+    assert not form.widgets_dict['d'].wid.disabled
+
+
+def test_uncached_checks_read_external_state(tmp_path):
+    path = tmp_path / 'input.csv'
+    check = {'n': lambda d: path.exists()}
+    cached = ifk.Form({'n': 1}, check=check)
+    uncached = ifk.Form({'n': 1}, check=check, cache_checks=False)
+    assert cached.check_and_return_values() is None
+    assert uncached.check_and_return_values() is None
+    path.touch()
+    assert cached.check_and_return_values() is None
+    assert uncached.check_and_return_values() == {'n': 1}
+
+
+def test_deferred_masonry_pages():
+    forms = [ifk.Form({'n': i}, title=f'F{i}', deferred=True) for i in range(5)]
+    masonry = ifk.Masonry(forms, page_size=2)
+    assert [form.materialized for form in forms] == [True, True, False, False, False]
+    # Deferred forms keep their values without widgets
+    forms[4].set_values({'n': 40})
+    assert forms[4].check_and_return_values() == {'n': 40}
+    assert not forms[4].materialized
+
+    masonry._next_button.click()
+    assert masonry.page == 1
+    assert masonry._page_label.value == 'Page 2 of 3'
+    assert [form.materialized for form in forms] == [True, True, True, True, False]
+    masonry.show_page(10)
+    assert masonry.page == 2 and masonry._next_button.disabled
+    assert forms[4].widgets_dict['n'].wid.value == 40
+
+    forms = [ifk.Form({'n': i}, deferred=True) for i in range(3)]
+    masonry = ifk.Masonry(forms, page_size=1, paging='more')
+    masonry._more_button.click()
+    assert [form.materialized for form in forms] == [True, True, False]
+    assert len(masonry._masonry.children) == 2
+
+
+def test_save_state_of_custom_kind(tmp_path, monkeypatch):
+    import datetime
+    from ipyformkit import core, spec, state
+    monkeypatch.setattr(spec, 'FIELD_TYPES', list(spec.FIELD_TYPES))
+    monkeypatch.setattr(core, 'WIDGET_FACTORIES', dict(core.WIDGET_FACTORIES))
+    monkeypatch.setattr(state, 'VALUE_CODECS', {})
+    ifk.register_field_kind(datetime.date, 'date', lambda field: ifk.core.widgets.DatePicker(value=field.default),
+                            encode=datetime.date.isoformat, decode=datetime.date.fromisoformat)
+    form = ifk.Form({'day': datetime.date(2024, 1, 2)})
+    form.widgets_dict['day'].wid.value = datetime.date(2024, 3, 4)
+    form.save_state(tmp_path / 'state.json')
+    other = ifk.Form({'day': datetime.date(2024, 1, 2)})
+    other.load_state(tmp_path / 'state.json')
+    assert other.values['day'] == datetime.date(2024, 3, 4)
+
+
+def test_close_releases_the_form():
+    import gc
+    import weakref
+    before = ifk.widget_counts()
+    form = ifk.Form({'a': 1, 'S': {'b': 2}}, title='T', disable={'b': lambda d: d['a'] > 1}, lazy=True)
+    form.add_submit(lambda values: None)
+    ref = weakref.ref(form)
+    del form
+    gc.collect()
+    # The open widgets keep the form working without a reference
+    assert ref() is not None
+    ref().widgets_dict['a'].wid.value = 2
+    assert ref().get_values()['a'] == 2
+    assert ifk.widget_counts()['forms'] == before['forms'] + 1
+
+    ref().close()
+    gc.collect()
+    assert ref() is None
+    after = ifk.widget_counts()
+    assert after['forms'] == before['forms']
+    assert after['widgets'] == before['widgets'], after['by_type']
@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def run(code):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC, os.environ.get('PYTHONPATH', '')]))
+    return subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True).stdout
+
+
+def test_rules_import_without_widgets():
+    out = run("import sys, ipyformkit as ifk; ifk.RuleSet; ifk.spec; print('ipywidgets' in sys.modules)")
+    assert out.strip() == 'False'
+
+
+def test_submodules_as_attributes():
+    out = run("import ipyformkit as ifk; print(ifk.rules.RuleSet is ifk.RuleSet, hasattr(ifk, 'missing'))")
+    assert out.strip() == 'True False'
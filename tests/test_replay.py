@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip('ipywidgets')
+import ipyformkit as ifk
+
+
+def make_form(tmp_path):
+    return ifk.Form({'a': 0, 'name': 'text', 'path': str(tmp_path) + '/', 'S': {'b': 1}},
+                    disable={'b': lambda d: d['a'] > 1}, lazy=True)
+
+
+def test_record_and_replay(tmp_path):
+    form = make_form(tmp_path)
+    with ifk.EventRecorder(form) as recorder:
+        form.widgets_dict['a'].wid.value = 1
+        form.widgets_dict['a'].wid.value = 2
+        form.widgets_dict['path'].wid.value = str(tmp_path / 'x.csv')
+        form.set_values({'b': 5})
+    form.widgets_dict['a'].wid.value = 3
+    assert [event['key'] for event in recorder.events] == ['a', 'a', 'path']
+    recorder.save(tmp_path / 'events.json')
+
+    events = ifk.EventRecorder.load(tmp_path / 'events.json')
+    events.append({'t': events[-1]['t'], 'key': 'b', 'value': 7})
+    other = make_form(tmp_path)
+    report = ifk.replay_events(other, events)
+    assert other.values['a'] == 2
+    assert other.values['path'] == str(tmp_path / 'x.csv')
+    assert other.widgets_dict['path'].wid.text.value == str(tmp_path / 'x.csv')
+    # Fields of sections that were not built yet are set as values
+    assert other.values['b'] == 7
+    assert [event['key'] for event in report['events']] == ['a', 'a', 'path', 'b']
+    # Only the condition reading a is evaluated
+    assert [event['evaluations'] for event in report['events'][:3]] == [1, 1, 0]
+    assert report['summary']['count'] == 4
+    assert other.rules.profiler is None
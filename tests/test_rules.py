@@ -0,0 +1,90 @@
+from ipyformkit.rules import RuleSet
+
+
+def make_rules(**kwargs):
+    return RuleSet(mandatory=['name'],
+                   disable={'c': lambda d: d['a'] > 0 or d['b'] > 0},
+                   hide={'b': lambda d: d['name'] == 'hidden'},
+                   check={'a': lambda d: d['a'] >= 0},
+                   **kwargs)
+
+
+def test_validate_valid():
+    result = make_rules().validate({'name': 'x', 'a': 0, 'b': 0, 'c': 1})
+    assert result.valid
+    assert result.values == {'name': 'x', 'a': 0, 'b': 0, 'c': 1}
+
+
+def test_validate_errors_and_inactive_fields():
+    result = make_rules().validate({'name': '', 'a': -1, 'b': 0, 'c': 1})
+    assert not result.valid
+    assert result.missing == ['name']
+    assert ('a', 'check') in [(key, reason) for key, reason, message in result.errors]
+
+    result = make_rules().validate({'name': 'x', 'a': 5, 'b': 0, 'c': 1})
+    assert 'c' not in result.values
+    assert result.states['c']['disable']
+
+
+def test_validate_skips_checks_of_inactive_fields():
+    rules = RuleSet(disable={'a': lambda d: d['off']}, check={'a': lambda d: d['a'] > 0})
+    assert rules.validate({'off': True, 'a': -1}).valid
+    assert not RuleSet(disable={'a': lambda d: d['off']}, check={'a': lambda d: d['a'] > 0},
+                       validate_inactive=True).validate({'off': True, 'a': -1}).valid
+
+
+def test_failing_condition_is_an_error():
+    rules = RuleSet(check={'a': lambda d: d['missing']})
+    result = rules.validate({'a': 1})
+    assert [reason for key, reason, message in result.errors] == ['error']
+
+
+def test_evaluate_traces_dependencies():
+    rules = make_rules()
+    rules.evaluate('disable', 'c', {'a': 1, 'b': 0})
+    assert rules.dependencies.get(('disable', 'c')) == {'a'}
+    rules.evaluate('disable', 'c', {'a': 0, 'b': 0})
+    assert rules.dependencies.get(('disable', 'c')) == {'a', 'b'}
+    assert ('disable', 'c') in rules.affected(['b'])
+
+
+def test_declared_dependencies_are_fixed():
+    rules = make_rules(depends_on={'c': ['a', 'b']})
+    rules.evaluate('disable', 'c', {'a': 1, 'b': 0})
+    assert rules.dependencies.get(('disable', 'c')) == {'a', 'b'}
+
+
+def test_validation_does_not_change_dependencies():
+    rules = make_rules()
+    rules.evaluate_states({'name': 'x', 'a': 0, 'b': 0, 'c': 1})
+    before = rules.dependencies.get(('disable', 'c'))
+    list(rules.validate_many([{'name': 'x', 'a': 5, 'b': 0, 'c': 1}]))
+    assert rules.dependencies.get(('disable', 'c')) == before == {'a', 'b'}
+    assert ('disable', 'c') in rules.affected(['b'])
+
+
+def test_cached_checks():
+    calls = []
+    def check(d):
+        calls.append(d['a'])
+        return d['a'] > 0
+    rules = RuleSet(check={'a': check})
+    assert rules.evaluate('check', 'a', {'a': 1, 'b': 0})
+    assert rules.evaluate('check', 'a', {'a': 1, 'b': 5})
+    assert calls == [1]
+    assert not rules.evaluate('check', 'a', {'a': -1, 'b': 5})
+    assert calls == [1, -1]
+    # Validation reads the cache, but does not write it
+    rules.validate({'a': 3})
+    rules.validate({'a': 3})
+    assert calls == [1, -1, 3, 3]
+
+
+def _positive(values):
+    return values['a'] > 0
+
+
+def test_validate_many_in_processes():
+    rules = RuleSet(check={'a': _positive})
+    results = list(rules.validate_many(({'a': i} for i in range(-3, 4)), processes=2, chunksize=2))
+    assert [result.valid for result in results] == [False] * 4 + [True] * 3
@@ -0,0 +1,29 @@
+from ipyformkit.spec import compile_spec, iter_fields, Section, NO_VALUE, MAX_DROPDOWN_OPTIONS
+
+
+def test_compile_spec_kinds():
+    rows = compile_spec({'name': 'Zaphod', 'age': 42, 'height': 2.05, 'flag': True,
+                         'kind': ('a', 'b'), 'go': None, 'notes': 'Write here...'})
+    kinds = {field.key: field.kind for field in iter_fields(rows)}
+    assert kinds == {'name': 'text', 'age': 'int', 'height': 'float', 'flag': 'checkbox',
+                     'kind': 'dropdown', 'go': 'button', 'notes': 'textarea'}
+    fields = {field.key: field for field in iter_fields(rows)}
+    assert fields['name'].default == ''
+    assert fields['name'].params['placeholder'] == 'Zaphod'
+    assert fields['height'].params['step'] == 0.01
+    assert fields['kind'].default == 'a'
+    assert fields['go'].default is NO_VALUE
+
+
+def test_compile_spec_rows_and_sections():
+    rows = compile_spec({('a', 'b'): (1, 2), 'more': {'c': 3.0}})
+    assert [field.key for field in rows[0]] == ['a', 'b']
+    section = rows[1][0]
+    assert isinstance(section, Section)
+    assert section.title == 'more'
+    assert [field.key for field in iter_fields(rows)] == ['a', 'b', 'c']
+
+
+def test_long_tuples_are_searchable():
+    rows = compile_spec({'big': tuple(range(MAX_DROPDOWN_OPTIONS + 1))})
+    assert rows[0][0].kind == 'searchable'
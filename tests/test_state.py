@@ -0,0 +1,51 @@
+import pytest
+from ipyformkit.spec import compile_spec
+from ipyformkit.state import schema_hash, make_state, write_state, read_state, migrate_values
+
+
+def test_schema_hash():
+    rows = compile_spec({'a': 1, 'b': ('x', 'y')})
+    assert schema_hash(rows) == schema_hash(compile_spec({'a': 1, 'b': ('x', 'y')}))
+    assert schema_hash(rows) != schema_hash(compile_spec({'a': 1, 'b': ('x', 'z')}))
+    assert schema_hash(rows) != schema_hash(compile_spec({'a': 1.0, 'b': ('x', 'y')}))
+
+
+def test_write_and_read_state(tmp_path):
+    rows = compile_spec({'a': 1, 'b': 'text'})
+    state = make_state(rows, {'a': 5, 'b': 'hello'})
+    path = tmp_path / 'state.json'
+    write_state(path, state)
+    assert read_state(path) == state
+    assert not (tmp_path / 'state.json.tmp').exists()
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        write_state(tmp_path / 'state.json', {}, format='yaml')
+
+
+def test_migrate_values():
+    state = make_state(compile_spec({'a': 1, 'b': 2.0, 'c': ('x', 'y'), 'gone': 1}),
+                       {'a': 3, 'b': 4.0, 'c': 'y', 'gone': 1})
+    rows = compile_spec({'a': 1.0, 'b': 2, 'c': ('x', 'z')})
+    assert migrate_values(state, rows, verbose=False) == {'a': 3.0, 'b': 4}
+
+
+def test_value_codecs(tmp_path, monkeypatch):
+    import datetime
+    from ipyformkit import spec, state
+    monkeypatch.setattr(spec, 'FIELD_TYPES', list(spec.FIELD_TYPES))
+    monkeypatch.setattr(state, 'VALUE_CODECS', {})
+    spec.register_field_type(datetime.date, lambda key, value: spec.Field(key, 'date', value, value, {}))
+    rows = compile_spec({'day': datetime.date(2024, 1, 2), 'n': 1})
+    values = {'day': datetime.date(2024, 3, 4), 'n': 2}
+    path = tmp_path / 'state.json'
+    with pytest.raises(TypeError, match='register_value_codec'):
+        write_state(path, make_state(rows, values))
+
+    state.register_value_codec('date', datetime.date.isoformat, datetime.date.fromisoformat)
+    write_state(path, make_state(rows, values))
+    saved = read_state(path)
+    assert saved['values']['day'] == '2024-03-04'
+    assert state.decode_values(saved) == values
+    assert migrate_values(saved, compile_spec({'day': datetime.date(2000, 1, 1)}), verbose=False) == {'day': values['day']}
@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import Executor, Future
+import pytest
+
+pytest.importorskip('ipywidgets')
+from ipyformkit.submit import SubmitAction
+
+
+class InlineExecutor(Executor):
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def wait_until_idle(action, timeout=5.0):
+    end = time.monotonic() + timeout
+    while action.busy and time.monotonic() < end:
+        time.sleep(0.01)
+    assert not action.busy
+
+
+def test_submit_result_and_failures(capsys):
+    done = []
+    action = SubmitAction(lambda: {'a': 2}, lambda values: values['a'] * 2,
+                          executor=InlineExecutor(), on_done=done.append)
+    assert action.submit()
+    assert action.result == 4 and done == [4]
+    assert action.status.value == 'Done.'
+
+    action.on_done = lambda result: 1 / 0
+    action.submit()
+    assert action.status.value.startswith('Done, on_done failed: ZeroDivisionError')
+    assert 'Error in on_done' in capsys.readouterr().out
+
+    action.func = lambda values: 1 / 0
+    action.submit()
+    assert isinstance(action.exception, ZeroDivisionError)
+    assert action.status.value.startswith('Failed')
+    assert not action.busy
+
+    action.validate = lambda: None
+    assert not action.submit()
+
+
+def test_submit_queue_on_thread():
+    gate = threading.Event()
+    counter = iter(range(10))
+    calls = []
+
+    def job(values):
+        gate.wait(5)
+        calls.append(values['n'])
+        return values['n']
+
+    action = SubmitAction(lambda: {'n': next(counter)}, job, max_pending=1)
+    assert action.submit()
+    assert action.busy
+    assert action.submit()
+    assert not action.submit()
+    assert action.pending == 1
+    gate.set()
+    wait_until_idle(action)
+    assert calls == [0, 1]
+    assert action.result == 1
+    action.close()
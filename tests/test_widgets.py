@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+
+pytest.importorskip('ipywidgets')
+from ipyformkit.custom_widgets import FileAutocomplete
+
+
+def suggestions(wid):
+    return [row.children[1].description for row in wid.suggestions_box.children if len(row.children) == 2]
+
+
+def test_file_autocomplete_synchronous(tmp_path):
+    for name in ['data.csv', 'data2.csv', 'notes.txt']:
+        (tmp_path / name).touch()
+    wid = FileAutocomplete(root_path=str(tmp_path), asynchronous=False)
+    wid.value = 'data'
+    assert suggestions(wid) == ['data.csv', 'data2.csv']
+    wid.value = 'zz'
+    assert wid.suggestions_box.children[0].value == 'No matches found'
+
+
+def test_file_autocomplete_asynchronous(tmp_path):
+    for name in ['data.csv', 'data2.csv', 'notes.txt']:
+        (tmp_path / name).touch()
+
+    async def main():
+        wid = FileAutocomplete(root_path=str(tmp_path))
+        wid.value = 'd'
+        wid.value = 'not'
+        # The search runs in a thread, the result is applied on the loop
+        assert suggestions(wid) == []
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if wid._pending is None:
+                break
+        # Only the latest request is applied
+        assert suggestions(wid) == ['notes.txt']
+        wid.close()
+
+    asyncio.run(main())
+
+
+def test_searchable_dropdown():
+    from traitlets import TraitError
+    from ipyformkit.custom_widgets import SearchableDropdown
+    options = [f"item {i}" for i in range(1000)]
+    wid = SearchableDropdown(options, max_results=3)
+    assert wid.value == 'item 0'
+    assert wid.text.value == 'item 0'
+
+    wid.text.value = 'M 99'
+    buttons = wid.suggestions_box.children
+    assert [button.description for button in buttons] == ['item 99', 'item 990', 'item 991']
+    buttons[1].click()
+    assert wid.value == 'item 990'
+    assert wid.suggestions_box.children == ()
+
+    wid.text.value = 'nothing'
+    assert wid.suggestions_box.children[0].value == 'No matches found'
+    with pytest.raises(TraitError):
+        wid.value = 'item 1000'
+    wid.disabled = True
+    assert wid.text.disabled